@@ -43,6 +43,7 @@ import os
 import time
 import multiprocessing
 from multiprocessing import Pool
+from sice_cog import write_cog
 
 multi_proc = False
 
@@ -75,8 +76,7 @@ def radiometric_calibration(R16, scene, inpath):
     R16_data = R16.read(1)
     R16_rc = R16_data * factor
     
-    with rasterio.open(inpath + 'r_TOA_S5_rc.tif', 'w', **profile_R16) as dst:
-        dst.write(R16_rc, 1)
+    write_cog(inpath + 'r_TOA_S5_rc.tif', R16_rc, profile_R16, resampling='average')
     
        
 def SCDA_v20(R550, R16, BT37, BT11, BT12, profile, scene, inpath, 
@@ -108,8 +108,7 @@ def SCDA_v20(R550, R16, BT37, BT11, BT12, profile, scene, inpath,
     # determining the NDSI, needed for the cloud detection
     NDSI = (R550 - R16) / (R550 + R16)
     
-    with rasterio.open(path + 'NDSI.tif', 'w', **profile) as dst:
-        dst.write(NDSI, 1)
+    write_cog(path + 'NDSI.tif', NDSI, profile, resampling='average')
     
     # initializing thresholds
     base = np.empty((R550.shape[0], R550.shape[1]))
@@ -152,8 +151,8 @@ def SCDA_v20(R550, R16, BT37, BT11, BT12, profile, scene, inpath,
     profile_cloud_detection = profile.copy()
     profile_cloud_detection.update(dtype=rasterio.int16)
     
-    with rasterio.open(path + 'SCDA_v20.tif', 'w', **profile_cloud_detection) as dst:
-        dst.write(cloud_detection.astype(np.int16), 1)
+    write_cog(path + 'SCDA_v20.tif', cloud_detection.astype(np.int16), 
+              profile_cloud_detection)
     
     return cloud_detection, NDSI
 
@@ -191,8 +190,7 @@ def SCDA_v14(R550, R16, BT37, BT11, BT12, NDSI, profile, scene, path,
         
         # determining the NDSI, needed for the cloud detection
         NDSI = (R550 - R16) / (R550 + R16)
-        with rasterio.open(path + 'NDSI.tif', 'w', **profile) as dst:
-            dst.write(NDSI, 1)
+        write_cog(path + 'NDSI.tif', NDSI, profile, resampling='average')
         
     diff = BT11 - BT37
     diff_threshold = 0.5 * BT12 - 131
@@ -217,8 +215,8 @@ def SCDA_v14(R550, R16, BT37, BT11, BT12, NDSI, profile, scene, path,
     profile_cloud_detection = profile.copy()
     profile_cloud_detection.update(dtype=rasterio.int16)
     
-    with rasterio.open(path + 'SCDA_v14.tif', 'w', **profile_cloud_detection) as dst:
-        dst.write(cloud_detection.astype(np.int16), 1)
+    write_cog(path + 'SCDA_v14.tif', cloud_detection.astype(np.int16), 
+              profile_cloud_detection)
     
     return cloud_detection
 
@@ -23,6 +23,7 @@ import os
 import pickle
 import time
 from multiprocessing import Pool, freeze_support
+from sice_cog import write_cog
 import warnings
 warnings.filterwarnings("ignore")
 
@@ -231,5 +232,5 @@ if __name__ == '__main__':
             cuml[valid] = filtered_BBAs[key][valid]
             filtered_BBAs_cumulative[key] = cuml
         
-        with rasterio.open(output_path + key + '.tif', 'w', **profile) as dst:
-            dst.write(filtered_BBAs_cumulative[key].astype(np.float32), 1)
+        write_cog(output_path + key + '.tif', filtered_BBAs_cumulative[key].astype(np.float32),
+                  profile, resampling='average')
@@ -4,12 +4,565 @@
 @author: Adrien Wehrlé, Jason E. Box, GEUS (Geological Survey of Denmark and Greenland), SICE project
 
 Check the availability of SICE products.
-At the end of the script, the user can set the option multi_proc to True if 
-the processing is too long. It allows to run the function by multiprocessing 
-using the nb_cores (given by the user) and drastically decrease computation time. 
+The dataset is scanned once (os.scandir) to build, for each date, the set of 
+available variables. Variables are matched by their exact names.
+Results of the scans can be stored in a persistent SQLite catalogue, updated 
+incrementally by only revisiting the date folders modified since the last scan.
+Several regions (following the /sice-data/SICE/{region}/mosaic/ layout of 
+S3_NRT.sh) can be checked over a date range in one call. Date folders can be 
+named YYYYMMDD or YYYY-MM-DD.
+Optionally, available products are validated by reading their overviews or 
+sampled blocks (valid pixel fraction, min, max), so that empty rasters are 
+reported. Statistics are cached by (path, size, mtime) in a SQLite file.
+Listing folders is I/O-bound, so date folders are scanned by a pool of 
+nb_threads threads (given by the user) to drastically decrease computation 
+time, especially on network storage.
 
 """
 
+import threading
+
+# writes to the SQLite catalogue are serialized between the threads of a 
+# process (e.g. regions updated in parallel), and connections wait up to 
+# catalogue_timeout seconds for the other processes
+catalogue_lock = threading.Lock()
+catalogue_timeout = 60
+
+
+def get_folder_date(folder_name):
+    '''
+    INPUTS:
+        folder_name: name of a date folder, YYYYMMDD or YYYY-MM-DD [string]
+        
+    OUTPUTS:
+        date: date of the folder, None if the name is not a date [datetime,NoneType]
+    
+    '''
+    
+    import datetime
+    
+    for date_format in ['%Y%m%d', '%Y-%m-%d']:
+        try:
+            return datetime.datetime.strptime(folder_name, date_format)
+        except ValueError:
+            pass
+        
+    return None
+
+
+def list_date_folders(inpath, start_date=None, end_date=None):
+    '''
+    INPUTS:
+        inpath: path to targeted dataset [string]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to 
+                              None to use all the dates [string,NoneType]
+        
+    OUTPUTS:
+        folders_names: names of the date folders within the period, sorted 
+                       by date. Folders of the same date named both YYYYMMDD 
+                       and YYYY-MM-DD are all kept, with a warning [list]
+    
+    '''
+    
+    import os
+    import pandas as pd
+    
+    with os.scandir(inpath) as entries:
+        folders_dates = {entry.name: get_folder_date(entry.name) for entry in entries
+                         if entry.is_dir()}
+    
+    folders_names = [name for name, date in folders_dates.items() if date is not None
+                     and (start_date is None or date >= pd.to_datetime(start_date))
+                     and (end_date is None or date <= pd.to_datetime(end_date))]
+    
+    folders_names = sorted(folders_names, key=lambda name: folders_dates[name])
+    
+    # same date in several folders (e.g. 20190601 and 2019-06-01)
+    for previous_name, name in zip(folders_names[:-1], folders_names[1:]):
+        if folders_dates[previous_name] == folders_dates[name]:
+            print('!!! WARNING: FILE DUPLICATES !!! %s and %s in %s' 
+                  %(previous_name, name, inpath))
+    
+    return folders_names
+
+
+def get_available_variables(path, variables_extension='.tif'):
+    '''
+    INPUTS:
+        path: path to a date folder [string]
+        variables_extension: extension of the files in which variables are 
+                             stored [string]
+        
+    OUTPUTS:
+        available_variables: names of the variables available in the date 
+                             folder [set]
+    
+    '''
+    
+    import os
+    
+    with os.scandir(path) as entries:
+        available_variables = {entry.name.split('.')[0] for entry in entries
+                               if entry.name.endswith(variables_extension)
+                               and entry.is_file()}
+        
+    return available_variables
+
+
+def update_catalogue(inpath='/srv/home/8675309/SICEv0/',
+                     catalogue='/srv/home/8675309/data_availability/SICE_catalogue.sqlite',
+                     region='Greenland',
+                     variables_extension='.tif',
+                     nb_threads=8):
+    '''
+    Records (region, date, variable, size, mtime) of SICE products in a SQLite
+    catalogue. Only date folders whose modification time changed since the 
+    last update are scanned again. Note that the modification time of a folder
+    changes when files are added, removed or renamed, not when a file is 
+    overwritten in place.
+    
+    INPUTS:
+        inpath: path to targeted dataset [string]
+        catalogue: path to the SQLite catalogue, created if missing [string]
+        region: region of the dataset [string]
+        variables_extension: extension of the files in which variables are 
+                             stored [string]
+        nb_threads: number of threads used to scan the date folders [int]
+        
+    OUTPUTS:
+        updated_dates: date folders scanned again or removed from the 
+                       catalogue [list]
+    
+    '''
+    
+    import os
+    import sqlite3
+    from concurrent.futures import ThreadPoolExecutor
+    
+    connection = sqlite3.connect(catalogue, timeout=catalogue_timeout)
+    
+    with catalogue_lock, connection:
+        connection.execute('''CREATE TABLE IF NOT EXISTS folders
+                              (region TEXT, date TEXT, mtime REAL,
+                               PRIMARY KEY (region, date))''')
+        connection.execute('''CREATE TABLE IF NOT EXISTS products
+                              (region TEXT, date TEXT, variable TEXT, 
+                               size INTEGER, mtime REAL,
+                               PRIMARY KEY (region, date, variable))''')
+    
+    # modification times of the folders at the last update
+    catalogue_mtimes = dict(connection.execute('''SELECT date, mtime FROM folders 
+                                                 WHERE region=?''', (region,)))
+    
+    # modification times of the folders now
+    folders_mtimes = {folder: os.stat(inpath + folder).st_mtime 
+                      for folder in list_date_folders(inpath)}
+    
+    # folders modified since the last update
+    modified_dates = sorted(date for date, mtime in folders_mtimes.items()
+                            if catalogue_mtimes.get(date) != mtime)
+    
+    def scan_products(date):
+        with os.scandir(inpath + date) as entries:
+            products = [(region, date, entry.name.split('.')[0], 
+                         entry.stat().st_size, entry.stat().st_mtime) 
+                        for entry in entries
+                        if entry.name.endswith(variables_extension)
+                        and entry.is_file()]
+        return products
+    
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        modified_products = list(executor.map(scan_products, modified_dates))
+    
+    updated_dates = []
+    
+    with catalogue_lock, connection:
+        
+        for date, products in zip(modified_dates, modified_products):
+            
+            mtime = folders_mtimes[date]
+            
+            connection.execute('DELETE FROM products WHERE region=? AND date=?', 
+                               (region, date))
+            connection.executemany('INSERT OR REPLACE INTO products VALUES (?, ?, ?, ?, ?)', 
+                                   products)
+            connection.execute('INSERT OR REPLACE INTO folders VALUES (?, ?, ?)', 
+                               (region, date, mtime))
+            updated_dates.append(date)
+        
+        # removing folders deleted from the dataset
+        for date in set(catalogue_mtimes) - set(folders_mtimes):
+            connection.execute('DELETE FROM products WHERE region=? AND date=?', 
+                               (region, date))
+            connection.execute('DELETE FROM folders WHERE region=? AND date=?', 
+                               (region, date))
+            updated_dates.append(date)
+    
+    connection.close()
+    
+    return updated_dates
+
+
+def get_catalogue_variables(catalogue='/srv/home/8675309/data_availability/SICE_catalogue.sqlite',
+                            region='Greenland'):
+    '''
+    INPUTS:
+        catalogue: path to the SQLite catalogue [string]
+        region: region of the dataset [string]
+        
+    OUTPUTS:
+        available_variables: names of the variables available for each date 
+                             folder of the region [dictionary]
+    
+    '''
+    
+    import sqlite3
+    
+    connection = sqlite3.connect(catalogue, timeout=catalogue_timeout)
+    
+    available_variables = {date: set() for (date,) in 
+                           connection.execute('SELECT date FROM folders WHERE region=?', 
+                                              (region,))}
+    
+    for date, variable in connection.execute('''SELECT date, variable FROM products
+                                               WHERE region=?''', (region,)):
+        available_variables[date].add(variable)
+    
+    connection.close()
+    
+    return available_variables
+
+
+def get_missing_products(dates, variables,
+                         catalogue='/srv/home/8675309/data_availability/SICE_catalogue.sqlite',
+                         region='Greenland'):
+    '''
+    Lists the products still to process, e.g. for the Near Real-Time (NRT) 
+    pipeline.
+    
+    INPUTS:
+        dates: names of the date folders to check [list]
+        variables: variables expected for each date [list]
+        catalogue: path to the SQLite catalogue [string]
+        region: region of the dataset [string]
+        
+    OUTPUTS:
+        missing_products: missing variables for each date with at least one 
+                          missing variable [dictionary]
+    
+    '''
+    
+    available_variables = get_catalogue_variables(catalogue=catalogue, region=region)
+    
+    missing_products = {}
+    for date in dates:
+        missing = sorted(set(variables) - available_variables.get(date, set()))
+        if missing:
+            missing_products[date] = missing
+            
+    return missing_products
+
+
+def get_variables(inpath, variables, variables_date=None, variables_extension='.tif'):
+    '''
+    INPUTS:
+        inpath: path to targeted dataset [string]
+        variables: variables to check [list] or path to csv file containing 
+                   variables in product_file_name column [.csv]
+        variables_date: if variables are unkown, pass a date folder where the 
+                        variables to check are available. Otherwise, set to 
+                        None [string,NoneType]
+        variables_extension: extension of the files in which variables to check 
+                             are stored [string]
+        
+    OUTPUTS:
+        variables: variables to check [list]
+    
+    '''
+    
+    import pandas as pd
+    
+    # look for variables from a given file if unknown
+    if type(variables_date) == str:
+        
+        variables = sorted(get_available_variables(inpath + variables_date, 
+                                                   variables_extension))
+        
+        # dealing with tifs that are not variables
+        if variables_date in variables:  
+            variables.remove(variables_date)    
+    
+    # if csv containing variables is given
+    if '.csv' in variables: 
+        variables_csv = pd.read_csv(variables)
+        variables = variables_csv['product_file_name']
+        
+    return list(variables)
+
+
+def scan_dataset(inpath, variables_extension='.tif', start_date=None, end_date=None,
+                 catalogue=None, region='Greenland', nb_threads=8, executor=None,
+                 progress_bar=True):
+    '''
+    INPUTS:
+        inpath: path to targeted dataset [string]
+        variables_extension: extension of the files in which variables to check 
+                             are stored [string]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to 
+                              None to use all the dates [string,NoneType]
+        catalogue: path to a SQLite catalogue updated by update_catalogue() and 
+                   used instead of scanning the date folders. Set to None 
+                   to scan the dataset [string,NoneType]
+        region: region of the dataset in the catalogue [string]
+        nb_threads: number of threads used to scan the date folders [int]
+        executor: thread pool shared between several datasets, created with 
+                  nb_threads threads if None [ThreadPoolExecutor,NoneType]
+        progress_bar: set to True to display a progress bar [bool]
+        
+    OUTPUTS:
+        available_variables: names of the variables available for each date 
+                             within the period, merged over the folders of 
+                             a same date [dictionary]
+    
+    '''
+    
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+    from tqdm import tqdm  
+    
+    # list all date folders needed, in a single scan of the dataset or from 
+    # the catalogue
+    folders_names = list_date_folders(inpath, start_date=start_date, end_date=end_date)
+    
+    if catalogue is not None:
+        update_catalogue(inpath=inpath, catalogue=catalogue, region=region,
+                         variables_extension=variables_extension, 
+                         nb_threads=nb_threads)
+        catalogue_variables = get_catalogue_variables(catalogue=catalogue, region=region)
+        folders_variables = [catalogue_variables[folder] for folder in folders_names]
+        
+    else:
+        paths = [inpath + folder for folder in folders_names]
+        extensions = [variables_extension] * len(folders_names)
+        
+        if executor is None:
+            with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+                folders_variables = list(tqdm(executor.map(get_available_variables, 
+                                                           paths, extensions),
+                                              total=len(paths), disable=not progress_bar))
+        else:
+            folders_variables = list(tqdm(executor.map(get_available_variables, 
+                                                       paths, extensions),
+                                          total=len(paths), disable=not progress_bar))
+    
+    # variables of duplicated date folders are merged
+    available_variables = {}
+    for folder, folder_variables in zip(folders_names, folders_variables):
+        date = pd.to_datetime(get_folder_date(folder))
+        available_variables[date] = available_variables.get(date, set()) | folder_variables
+    
+    return available_variables
+
+
+def get_availability_matrix(available_variables, variables, date_list):
+    '''
+    INPUTS:
+        available_variables: names of the variables available for each date,
+                             computed by scan_dataset() [dictionary]
+        variables: variables to check [list]
+        date_list: expected dates [DatetimeIndex]
+        
+    OUTPUTS:
+        availability: 1 if the variable is available at the date, 0 otherwise,
+                      with dates in rows and variables in columns [array]
+    
+    '''
+    
+    import numpy as np
+    
+    # (date, variable) positions of the available products
+    variables_index = {var: j for j, var in enumerate(variables)}
+    rows = []
+    cols = []
+    for i, date in zip(date_list.get_indexer(list(available_variables.keys())),
+                       available_variables.keys()):
+        for var in available_variables[date] & variables_index.keys():
+            rows.append(i)
+            cols.append(variables_index[var])
+    
+    # data availability updated only if date and variable exists
+    availability = np.zeros((len(date_list), len(variables)), dtype=np.uint8)
+    availability[rows, cols] = 1
+    
+    return availability
+
+
+def get_product_statistics(path, nb_blocks=64):
+    '''
+    Computes statistics of a product from its smallest overview if any, from
+    nb_blocks blocks evenly sampled otherwise, to avoid reading the full raster.
+    
+    INPUTS:
+        path: path to the product [string]
+        nb_blocks: number of blocks sampled if the product has no overview [int]
+        
+    OUTPUTS:
+        valid_fraction: fraction of valid (not no data and finite) pixels [float]
+        minimum, maximum: minimum and maximum of the valid pixels, NaN if no 
+                          valid pixel [float]
+    
+    '''
+    
+    import numpy as np
+    import rasterio
+    
+    with rasterio.open(path) as src:
+        
+        overviews = src.overviews(1)
+        
+        if overviews:
+            out_shape = (max(1, src.height // overviews[-1]), 
+                         max(1, src.width // overviews[-1]))
+            data = src.read(1, masked=True, out_shape=out_shape).ravel()
+        else:
+            windows = [window for _, window in src.block_windows(1)]
+            step = max(1, len(windows) // nb_blocks)
+            data = np.ma.concatenate([src.read(1, window=window, masked=True).ravel() 
+                                      for window in windows[::step]])
+    
+    values = np.ma.getdata(data)
+    invalid = np.ma.getmaskarray(data)
+    if np.issubdtype(values.dtype, np.floating):
+        invalid = invalid | ~np.isfinite(values)
+    
+    valid_values = values[~invalid]
+    
+    if valid_values.size == 0:
+        return 0., np.nan, np.nan
+    
+    return valid_values.size / values.size, float(valid_values.min()), float(valid_values.max())
+
+
+def validate_products(paths,
+                      validation_cache='/srv/home/8675309/data_availability/SICE_validation_cache.sqlite',
+                      nb_threads=8):
+    '''
+    Validates products using get_product_statistics(). Statistics are cached 
+    by (path, size, mtime), so that only new or modified products are read.
+    Missing or unreadable products get a valid pixel fraction of 0 and are 
+    not cached.
+    
+    INPUTS:
+        paths: paths to the products [list]
+        validation_cache: path to the SQLite cache, created if missing [string]
+        nb_threads: number of threads used to read the products [int]
+        
+    OUTPUTS:
+        statistics: path, size, mtime, valid_fraction, minimum and maximum of 
+                    each product [dataframe]
+    
+    '''
+    
+    import os
+    import sqlite3
+    import numpy as np
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
+    
+    connection = sqlite3.connect(validation_cache)
+    
+    with connection:
+        connection.execute('''CREATE TABLE IF NOT EXISTS validation
+                              (path TEXT PRIMARY KEY, size INTEGER, mtime REAL,
+                               valid_fraction REAL, minimum REAL, maximum REAL)''')
+    
+    # cached statistics of the products, queried by chunks
+    cached = {}
+    chunk_size = 500
+    for i in range(0, len(paths), chunk_size):
+        chunk = paths[i:i + chunk_size]
+        query = 'SELECT * FROM validation WHERE path IN (%s)' % ','.join('?' * len(chunk))
+        for row in connection.execute(query, chunk):
+            cached[row[0]] = row
+    
+    def validate_product(path):
+        try:
+            stat = os.stat(path)
+            row = cached.get(path)
+            if row is not None and row[1] == stat.st_size and row[2] == stat.st_mtime:
+                return row, False
+            return (path, stat.st_size, stat.st_mtime) + get_product_statistics(path), True
+        except OSError as error:
+            print('!!! WARNING: %s' % error)
+            return (path, None, None, 0., np.nan, np.nan), False
+    
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        results = list(executor.map(validate_product, paths))
+    
+    with connection:
+        connection.executemany('INSERT OR REPLACE INTO validation VALUES (?, ?, ?, ?, ?, ?)',
+                               [row for row, updated in results if updated])
+    
+    connection.close()
+    
+    statistics = pd.DataFrame([row for row, updated in results],
+                              columns=['path', 'size', 'mtime', 'valid_fraction', 
+                                       'minimum', 'maximum'])
+    
+    return statistics
+
+
+def get_validity_matrix(inpath, availability, variables, date_list, variables_extension='.tif',
+                        validation_cache='/srv/home/8675309/data_availability/SICE_validation_cache.sqlite',
+                        min_valid_fraction=0., nb_threads=8):
+    '''
+    INPUTS:
+        inpath: path to targeted dataset [string]
+        availability: availability matrix computed by get_availability_matrix() [array]
+        variables: variables to check [list]
+        date_list: expected dates [DatetimeIndex]
+        variables_extension: extension of the files in which variables to check 
+                             are stored [string]
+        validation_cache: path to the SQLite cache of validate_products() [string]
+        min_valid_fraction: products with a valid pixel fraction lower or equal 
+                            are considered invalid [float]
+        nb_threads: number of threads used to read the products [int]
+        
+    OUTPUTS:
+        validity: 1 if the variable is available and valid at the date, -1 if 
+                  available but invalid, 0 otherwise [array]
+        statistics: statistics of the available products computed by 
+                    validate_products() [dataframe]
+    
+    '''
+    
+    import os
+    import numpy as np
+    import pandas as pd
+    
+    # several folders can share a date (e.g. 20190601 and 2019-06-01)
+    folders = {}
+    for folder in list_date_folders(inpath, start_date=date_list[0], end_date=date_list[-1]):
+        folders.setdefault(pd.to_datetime(get_folder_date(folder)), []).append(folder)
+    
+    def get_product_path(date, variable):
+        paths = [inpath + folder + os.sep + variable + variables_extension 
+                 for folder in folders[date]]
+        return next((path for path in paths if os.path.isfile(path)), paths[0])
+    
+    rows, cols = np.nonzero(availability)
+    paths = [get_product_path(date_list[i], variables[j]) for i, j in zip(rows, cols)]
+    
+    statistics = validate_products(paths, validation_cache=validation_cache, 
+                                   nb_threads=nb_threads)
+    
+    invalid = statistics['valid_fraction'].values <= min_valid_fraction
+    
+    validity = availability.astype(np.int8)
+    validity[rows[invalid], cols[invalid]] = -1
+    
+    return validity, statistics
+
 
 def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
                             outpath='/srv/home/8675309/data_availability/',
@@ -19,7 +572,15 @@ def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
                             visualisation=False,
                             fig_save=True,
                             fig_path='/srv/home/8675309/data_availability/',
-                            fig_extension='eps'): 
+                            fig_extension='eps',
+                            catalogue=None,
+                            region='Greenland',
+                            nb_threads=8,
+                            start_date=None,
+                            end_date=None,
+                            validate=False,
+                            validation_cache=None,
+                            min_valid_fraction=0.): 
     '''
     INPUTS:
         inpath: path to targeted dataset [string]
@@ -27,7 +588,7 @@ def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
         variables: variables to check [list] or path to csv 
                    file containing variables in product_file_name 
                    column (default) [.csv]
-        variables_date: if variables are unkown, pass a date (YYYYMMDD) where 
+        variables_date: if variables are unkown, pass a date folder where 
                         the variables to check are available. Otherwise, set to 
                         None (default) [string,NoneType]
         variables_extension: extension of the files in which variables to check 
@@ -36,89 +597,77 @@ def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
         fig_save: figure named data_avail.[fig_extension] saved if True (True as default) [bool]
         fig_path: Path where to save the figure [string]
         fig_extension: Extension with which the figure is saved (eps as default) [string]
+        catalogue: path to a SQLite catalogue updated by update_catalogue() and 
+                   used instead of scanning the date folders. Set to None 
+                   (default) to scan the dataset [string,NoneType]
+        region: region of the dataset in the catalogue [string]
+        nb_threads: number of threads used to scan the date folders [int]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to 
+                              None (default) to use the first and last 
+                              available dates [string,NoneType]
+        validate: set to True to read the available products and mark the ones 
+                  with a valid pixel fraction lower or equal to min_valid_fraction
+                  with -1 (False as default) [bool]
+        validation_cache: path to the SQLite cache of the product statistics, 
+                          set to None (default) to store it in outpath 
+                          [string,NoneType]
+        min_valid_fraction: valid pixel fraction under which a product is 
+                            invalid [float]
         
     OUTPUTS:
         data_availability: matrix with dates in rows and variables in columns [dataframe]
         data_availability_from_{start_date}_to{end_date}.csv: file containing data_availability,
                                                               stored in outpath [.csv]
+        if validate set to True:
+            data_validation_from_{start_date}_to{end_date}.csv: file containing the 
+                                                                statistics of the 
+                                                                available products,
+                                                                stored in outpath [.csv]
     
     '''
     
     import numpy as np
     import pandas as pd
     import matplotlib.pyplot as plt
-    import glob
-    import os
-    from tqdm import tqdm  
     
     # set default plot parameters (ESA font)
     plt.rcParams['font.sans-serif'] = ['Georgia']
     plt.rcParams["font.size"] = 12
 
-    # look for variables from a given file if unknown
-    if type(variables_date) == str:
-        
-        variables_filenames = list(np.sort(glob.glob(inpath + variables_date 
-                                                     + os.sep + '*' 
-                                                     + variables_extension)))
-        
-        variables = [i.split(os.sep)[-1].split('.')[0] for i in variables_filenames]
-        
-        # dealing with tifs that are not variables
-        if variables_date in variables:  
-            variables.remove(variables_date)    
+    variables = get_variables(inpath, variables, variables_date=variables_date,
+                              variables_extension=variables_extension)
     
-    # if csv containing variables is given
-    if '.csv' in variables: 
-        variables_csv = pd.read_csv(variables)
-        variables = variables_csv['product_file_name']
-        
-    # list all files needed 
-    files_names = list(np.sort(glob.glob(inpath + '2019*'))) 
-    # generalize paths
-    files_names = [os.path.normpath(f) for f in files_names] 
+    # date -> set of available variables
+    available_variables = scan_dataset(inpath, variables_extension=variables_extension,
+                                       start_date=start_date, end_date=end_date,
+                                       catalogue=catalogue, region=region, 
+                                       nb_threads=nb_threads)
 
     # start and end dates as datetimes 
-    start_date = pd.to_datetime(files_names[0].split(os.sep)[-1], format='%Y%m%d')
-    end_date = pd.to_datetime(files_names[-1].split(os.sep)[-1], format='%Y%m%d')
-
-    # duration
-    nb_days = (end_date - start_date).days + 1 
+    if start_date is None:
+        start_date = min(available_variables)
+    if end_date is None:
+        end_date = max(available_variables)
     
     # list of expected dates
-    date_list = pd.date_range(start=start_date, periods=nb_days)  
-    data_availability = pd.DataFrame(columns=variables)
+    date_list = pd.date_range(start=start_date, end=end_date)  
     
-    # filling rows with expected dates
-    data_availability['date'] = date_list 
+    availability = get_availability_matrix(available_variables, variables, date_list)
     
-    # filling variables with 0
-    data_availability.loc[:, data_availability.columns != 'date'] = 0 
+    if validate:
+        if validation_cache is None:
+            validation_cache = outpath + 'SICE_validation_cache.sqlite'
+        availability, statistics = get_validity_matrix(inpath, availability, variables, 
+                                                       date_list, 
+                                                       variables_extension=variables_extension,
+                                                       validation_cache=validation_cache,
+                                                       min_valid_fraction=min_valid_fraction,
+                                                       nb_threads=nb_threads)
     
-    # data availability updated only if date and variable exists
-    for j, file in tqdm(enumerate(files_names)): 
-        
-        # date check
-        if np.sum(pd.to_datetime(file.split(os.sep)[-1], format='%Y%m%d')
-                  == data_availability['date']) == 1:
-            
-            available_variable_filenames = list(np.sort(glob.glob(inpath 
-                                                                  + str(file.split(os.sep)[-1])
-                                                                  + os.sep 
-                                                                  + '*' + variables_extension)))
-                
-            for var in variables:
-                
-                # variables check
-                if len([s for s in available_variable_filenames if var in s]) >= 1:
-                    
-                    indx = np.where(pd.to_datetime(file.split(os.sep)[-1], format='%Y%m%d')
-                                    == data_availability['date'])[0]
-                    data_availability.at[indx, var] = 1
-        
-        elif np.sum(pd.to_datetime(file.split(os.sep)[-1], format='%Y%m%d')
-                    == data_availability['date']) > 1:
-            print('!!! WARNING: FILE DUPLICATES !!!')
+    data_availability = pd.DataFrame(availability, columns=variables)
+    
+    # filling rows with expected dates
+    data_availability['date'] = date_list 
                     
             
     dates_str = [d.strftime('%Y-%m-%d') for d in data_availability['date']]   
@@ -126,6 +675,10 @@ def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
                       + '_to_' + dates_str[-1] + '.csv'
     data_availability.to_csv(output_filename, index=False)         
     
+    if validate:
+        statistics.to_csv(outpath + 'data_validation_from_' + dates_str[0] 
+                          + '_to_' + dates_str[-1] + '.csv', index=False)
+    
     if visualisation:
         
         # plot yticks every vis_step tick
@@ -169,139 +722,126 @@ def data_availability_check(inpath='/srv/home/8675309/SICEv0/',
     return data_availability
 
 
-'''
-The section below is similar to data_availability_check(), just reformulated to 
-correctly run by multiprocessing.
-'''
-
-multi_proc = False
-visualisation = False
-nb_cores = 8
-
-if multi_proc:
-    
-    import numpy as np
-    import pandas as pd
-    import matplotlib.pyplot as plt
-    import glob
-    import time
-    from multiprocessing import Pool
-    
-    inpath = 'C:/Users/Adrien/Dropbox/AW/Greenland/'
-    outpath = 'C:/Users/Adrien/Desktop/GEUS_2019/'
-    variables = ['OAA', 'OZA', 'Oa01_reflectance', 'Oa02_reflectance',
-                 'Oa03_reflectance', 'Oa04_reflectance', 'Oa05_reflectance']
-    variables_date = '20190801'
-    variables_extension = '.tif'
-    visualisation = False
-    
-    # look for variables from a given file if unknown
-    if type(variables_date) == str:
-        variables_filenames = list(np.sort(glob.glob(inpath + variables_date 
-                                                     + '\\*' + variables_extension)))
-        variables = [i.split('\\')[-1].split('.')[0] for i in variables_filenames]
+def regions_availability_check(inpath='/sice-data/SICE/{region}/mosaic/',
+                               regions=['Greenland', 'Iceland', 'Svalbard', 'NovayaZemlya',
+                                        'SevernayaZemlya', 'FransJosefLand', 
+                                        'NorthernArcticCanada', 'SouthernArcticCanada',
+                                        'JanMayen', 'Norway', 'Beaufort'],
+                               outpath='/srv/home/8675309/data_availability/',
+                               variables='/srv/home/8675309/data_availability/SICE_products.csv',
+                               variables_date=None,
+                               variables_extension='.tif',
+                               start_date='2017-01-01',
+                               end_date=None,
+                               catalogue=None,
+                               nb_threads=8,
+                               validate=False,
+                               validation_cache=None,
+                               min_valid_fraction=0.):
+    '''
+    INPUTS:
+        inpath: path to targeted datasets, {region} being replaced by the 
+                region names [string]
+        regions: regions to check [list]
+        outpath: path to result file [string]
+        variables: variables to check [list] or path to csv 
+                   file containing variables in product_file_name 
+                   column (default) [.csv]
+        variables_date: if variables are unkown, pass a date folder of the 
+                        first region where the variables to check are 
+                        available. Otherwise, set to None (default) [string,NoneType]
+        variables_extension: extension of the files in which variables to check 
+                             are stored [string]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, end_date
+                              set to None (default) for today [string,NoneType]
+        catalogue: path to a SQLite catalogue updated by update_catalogue() and 
+                   used instead of scanning the date folders. Regions are
+                   scanned in parallel, their writes to the catalogue being
+                   serialized. Set to None (default) to scan the datasets 
+                   [string,NoneType]
+        nb_threads: number of threads used to scan the date folders, shared 
+                    between regions [int]
+        validate: set to True to read the available products and mark the ones 
+                  with a valid pixel fraction lower or equal to min_valid_fraction
+                  with -1 (False as default) [bool]
+        validation_cache: path to the SQLite cache of the product statistics, 
+                          set to None (default) to store it in outpath 
+                          [string,NoneType]
+        min_valid_fraction: valid pixel fraction under which a product is 
+                            invalid [float]
         
-        # dealing with tifs that are not variables
-        if variables_date in variables: 
-            variables.remove(variables_date)    
+    OUTPUTS:
+        data_availability: region and date in rows and variables in columns, 
+                           1 if available (-1 if invalid) and 0 otherwise. 
+                           Regions that could not be scanned are reported 
+                           and left out [dataframe]
+        data_availability_from_{start_date}_to_{end_date}.csv.gz: file containing
+                                                                 data_availability,
+                                                                 stored in outpath [.csv.gz]
     
-    # list all files needed 
-    files_names = list(np.sort(glob.glob(inpath + '2019*'))) 
+    '''
     
-    # start and end dates as datetimes 
-    start_date = pd.to_datetime(files_names[0].split('\\')[-1], format='%Y%m%d')
-    end_date = pd.to_datetime(files_names[-1].split('\\')[-1], format='%Y%m%d')
-
-    # duration
-    nb_days = (end_date - start_date).days + 1 
+    import pandas as pd
+    from concurrent.futures import ThreadPoolExecutor
     
-    # list of expected dates
-    date_list = pd.date_range(start=start_date, periods=nb_days) 
+    if end_date is None:
+        end_date = pd.Timestamp.today().strftime('%Y-%m-%d')
     
-    def DAC_processing(file):
-        
-        data_availability_file = []
-        file_datetime = pd.to_datetime(file.split('\\')[-1], format='%Y%m%d')
-        
-        # date check
-        if np.sum(file_datetime == data_availability['date']) == 1:
-            available_variable_filenames = list(np.sort(glob.glob(inpath 
-                                                                  + str(file.split('\\')[-1])
-                                                                  + '\\*' + variables_extension)))
-                
-            for var in variables:
-                
-                # variables check
-                if len([s for s in available_variable_filenames if var in s]) >= 1:
-                    data_availability_file.append(1)
-                else:
-                    data_availability_file.append(0)
-                    
-        elif np.sum(pd.to_datetime(file.split('\\')[-1], format='%Y%m%d')
-                    == data_availability['date']) == 0:
-            data_availability_file = [0] * len(variables)
-        
-        elif np.sum(pd.to_datetime(file.split('\\')[-1], format='%Y%m%d')
-                    == data_availability['date']) > 1:
-            print('!!! WARNING: FILE DUPLICATES !!!')
+    variables = get_variables(inpath.format(region=regions[0]), variables, 
+                              variables_date=variables_date,
+                              variables_extension=variables_extension)
     
-        return data_availability_file, file_datetime
-        
+    date_list = pd.date_range(start=start_date, end=end_date)
     
-    # multiprocessing run    
-    start_time = time.time()
-    local_time = time.ctime(start_time)
+    # a missing or unreadable region is reported without stopping the others
+    def scan_region(region):
+        try:
+            return scan_dataset(inpath.format(region=region), 
+                                variables_extension=variables_extension,
+                                start_date=start_date, end_date=end_date,
+                                catalogue=catalogue, region=region, nb_threads=nb_threads,
+                                executor=executor, progress_bar=False)
+        except Exception as e:
+            print('ERROR: %s failed: %s' % (region, e))
+            return None
     
-    if __name__ == '__main__':
-        
-        data_availability_files = []
-        file_datetimes = []
-        
-        with Pool(nb_cores) as p:
-            
-            for d_av, f_dt in p.map(DAC_processing, files_names):
-                
-                data_availability_files.append(d_av)
-                file_datetimes.append(f_dt)
-        
-    print("--- %s seconds ---" % (time.time() - start_time))
+    # regions listed in parallel, date folders scanned by a shared pool
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        with ThreadPoolExecutor(max_workers=len(regions)) as regions_executor:
+            regions_variables = list(regions_executor.map(scan_region, regions))
     
-    # creating the same output as data_availability_check() with multiprocessing results
-    data_availability = pd.DataFrame(columns=variables) 
+    if validation_cache is None:
+        validation_cache = outpath + 'SICE_validation_cache.sqlite'
     
-    # filling rows with expected dates
-    data_availability['date'] = date_list 
+    failed = [region for region, available_variables in zip(regions, regions_variables)
+              if available_variables is None]
+    if failed:
+        print('Failed regions: %s' % ', '.join(failed))
     
-    # filling variables with 0
-    data_availability.loc[:, data_availability.columns != 'date'] = 0 
-    data_availability.index = data_availability['date']
+    regions_availability = []
+    for region, available_variables in zip(regions, regions_variables):
+        if available_variables is None:
+            continue
+        availability = get_availability_matrix(available_variables, variables, date_list)
+        if validate:
+            availability, _ = get_validity_matrix(inpath.format(region=region), 
+                                                  availability, variables, date_list, 
+                                                  variables_extension=variables_extension,
+                                                  validation_cache=validation_cache,
+                                                  min_valid_fraction=min_valid_fraction,
+                                                  nb_threads=nb_threads)
+        region_availability = pd.DataFrame(availability, columns=variables)
+        region_availability.insert(0, 'date', date_list)
+        region_availability.insert(0, 'region', region)
+        regions_availability.append(region_availability)
     
-    # filling data_availability with multiprocessing results
-    for i, fs_dt in enumerate(file_datetimes): 
-        data_availability[fs_dt] = data_availability_files[i]
-        
-    data_availability = data_availability.reset_index(drop=True)
+    if regions_availability:
+        data_availability = pd.concat(regions_availability, ignore_index=True)
+    else:
+        data_availability = pd.DataFrame(columns=['region', 'date'] + list(variables))
     
-    dates_str = [d.strftime('%Y-%m-%d') for d in data_availability['date']]
-    output_filename = outpath + 'data_availability_from_' + dates_str[0] \
-                      + '_to_' + dates_str[-1] + '.csv'
-    data_availability.to_csv(output_filename, index=False)   
-
+    output_filename = outpath + 'data_availability_from_' + date_list[0].strftime('%Y-%m-%d') \
+                      + '_to_' + date_list[-1].strftime('%Y-%m-%d') + '.csv.gz'
+    data_availability.to_csv(output_filename, index=False)
     
-    if visualisation:
-        
-        fig, ax = plt.subplots()
-        ax.imshow(data_availability.loc[:, data_availability.columns != 'date'], 
-                  cmap='bwr_r', aspect='auto')
-        ax.set_xticks(np.arange(0, len(variables)))
-        minor_ticksx = np.arange(0, len(variables)) + 0.5
-        minor_ticksy = np.arange(0, data_availability.shape[0]) + 0.5
-        ax.set_xticks(minor_ticksx, minor=True)
-        ax.set_yticks(minor_ticksy, minor=True)
-        ax.set_xticklabels(variables)
-        ax.set_yticks(np.arange(0, data_availability.shape[0]))
-        ax.set_yticklabels(dates_str)
-        plt.xticks(rotation=80)
-        ax.grid(which='minor', color='k', linewidth=2)
-        plt.title('Data availability from %s to %s' % (dates_str[0], dates_str[-1]),
-                  fontsize=20)
+    return data_availability
@@ -5,14 +5,21 @@
 
 Clip ArcticDEM derived slopes for a given region based on a mask. 
 Slopes have been processed using SNAP slopes calculator.
+ArcticDEM elevations (elevation.img) can also be clipped to compute horizon
+angles with get_horizon_angles.py. extract_arcticdem_variables() clips several
+variables at once in memory (slopes and slope aspects by default).
 
-Function is run in default mode at the end of the script.
-
-WARNING: all the variables temporary stored in memory will be cleared to enable 
-the deletion of temporary outputs. 
+Regions are run in parallel at the end of the script. The script can also be 
+run from the command line, e.g.:
+    python extract_arcticdem.py --regions Iceland Svalbard --nb_cores 2
 
 """
 
+import os
+import argparse
+import multiprocessing
+from multiprocessing import Pool
+
 
 def extract_arcticdem(adem='/srv/home/8675309/AW/arctic_dem/slope.img',
                       region='NovayaZemlya',
@@ -21,6 +28,8 @@ def extract_arcticdem(adem='/srv/home/8675309/AW/arctic_dem/slope.img',
                       verbose=True):
     
     '''
+    Clips a single ArcticDEM variable, see extract_arcticdem_variables().
+    
     INPUTS:
         adem: path of ArcticDEM .tif file [string]
         region: region to clip [string]
@@ -29,217 +38,242 @@ def extract_arcticdem(adem='/srv/home/8675309/AW/arctic_dem/slope.img',
         verbose: set to True to print details about processing [boolean]
         
     OUTPUTS:
-        {outpath}/{region}_arcticdem_slope.tif: clipped ArcticDEM (EPSG: 3413) [.tif]
+        {outpath}/{region}_arcticdem_{var}.tif: clipped ArcticDEM (EPSG: 3413) [.tif]
         {outpath}/{region}_mask_resampled.tif: resampled mask to fit clipped 
                                                ArcticDEM resolution [.tif]
+        out_tif: path of the clipped ArcticDEM [string]
     
     '''
     
+    #check if running slope, aspect or elevation
+    var=adem.split('/')[-1].split('.')[0]
+    
+    if var not in ['slope', 'aspect', 'elevation']:
+        print('ERROR: Wrong ArcticDEM input file. Rename to slope.img/aspect.img/elevation.img or modify the code')
+        return
+    
+    outputs=extract_arcticdem_variables(adems={var: adem}, region=region, 
+                                        regional_mask=regional_mask, 
+                                        outpath=outpath, verbose=verbose)
+    
+    return outputs[var]
+    
+
+def extract_arcticdem_variables(adems={'slope': '/srv/home/8675309/AW/arctic_dem/slope.img',
+                                       'aspect': '/srv/home/8675309/AW/arctic_dem/aspect.img'},
+                                region='NovayaZemlya',
+                                regional_mask='/srv/home/8675309/AW/masks/NovayaZemlya.tif',
+                                outpath='/srv/home/8675309/AW/',
+                                verbose=True):
+    
+    '''
+    Same as extract_arcticdem() for several ArcticDEM variables sharing the 
+    same grid. Variables are clipped and reprojected as the bands of a single
+    array and the regional mask is resampled once, in memory: only the final 
+    outputs are written.
     
+    INPUTS:
+        adems: paths of ArcticDEM files by variable (slope, aspect or 
+               elevation) [dictionary]
+        region: region to clip [string]
+        regional_mask: path of the mask associated to the selected region [.tif]
+        outpath: folder where to the clipped ArcticDEM [string]
+        verbose: set to True to print details about processing [boolean]
+        
+    OUTPUTS:
+        {outpath}/{region}_arcticdem_{var}.tif: clipped ArcticDEM (EPSG: 3413) 
+                                                for each variable [.tif]
+        {outpath}/{region}_mask_resampled.tif: resampled mask to fit clipped 
+                                               ArcticDEM resolution [.tif]
+        outputs: paths of the clipped ArcticDEM by variable [dictionary]
+    
+    '''
+    
+    import numpy as np
     import rasterio
-    from shapely.geometry import box
-    import geopandas as gpd
+    from shapely.geometry import box, mapping
     from rasterio.mask import mask
+    from rasterio.transform import array_bounds
     from rasterio.warp import calculate_default_transform, reproject, Resampling
-    from IPython import get_ipython
-    import os
-    from osgeo import gdal, gdalconst
-    
+    from sice_cog import write_cog
     
-    #clear all variables to enable file deletion
-    get_ipython().magic('reset -sf') 
-    
-    #check if running slope or aspect 
-    var=adem.split('/')[-1].split('.')[0]
+    variables=list(adems)
     
     if verbose:
-      if var=='slope':
-          print('\n')
-          print('Running extract_arctidem for %s... [SLOPE]' %region)
-      elif var=='aspect':
-          print('\n')
-          print('ASPECT: Running extract_arctidem for %s... [ASPECT]' %region)
-      else:
-          print('\n')
-          print('ERROR: Wrong ArcticDEM input file. Rename to slope.img/aspect.img or modify the code')
-        
+      print('\n')
+      print('Running extract_arctidem for %s... [%s]' %(region, '/'.join(variables).upper()))
     
-    #initialize output name
-    target_crs='EPSG: 3413'
-    target_crs_name=target_crs.split(':')[1]
-        
-    out_tif=outpath+region+'_adem_'+var+'.tif'
-    out_tif_3413=outpath+region+'_arcticdem_'+var+'_temp'+'.tif'
-    
-    #delete outputs if already exists
-    if os.path.exists(out_tif):
-        if verbose:
-          if var=='slope':
-              print('WARNING: Clipped ArcticDEM derived slopes already exist...')
-              print('Deleting Clipped ArcticDEM derived slopes...')
-          elif var=='aspect':
-              print('WARNING: Clipped ArcticDEM derived slope aspects already exist...')
-              print('Deleting Clipped ArcticDEM derived slope aspects...')
-        os.remove(out_tif)
-        
-    if os.path.exists(out_tif_3413):
-        if verbose:
-          if var=='slope':
-              print('WARNING: Reprojected and clipped ArcticDEM derived slopes already exist...')
-              print('Deleting reprojected and clipped ArcticDEM derived slopes...')
-          elif var=='aspect':
-              print('WARNING: Reprojected and clipped ArcticDEM derived slope aspect already exist...')
-              print('Deleting reprojected and clipped ArcticDEM derived slope aspect...')
-        os.remove(out_tif_3413)
-    
-    data = rasterio.open(adem)
-    regional_mask_path=regional_mask
     regional_mask=rasterio.open(regional_mask)
     
     #create the bbox with regional_mask dimensions
     lower_right_corner=regional_mask.transform * (regional_mask.width, regional_mask.height)
     upper_left_corner=regional_mask.transform * (0, 0)
     bbox = box(upper_left_corner[0], lower_right_corner[1], lower_right_corner[0], upper_left_corner[1])
-            
-            
-    
-    #insert the bbox into a GeoDataFrame
-    geo = gpd.GeoDataFrame({'geometry': bbox}, index=[0], crs=data.crs)
+    coords = [mapping(bbox)]
     
-    
-    #coordinates of the geometry so that rasterio handles it
-    def getFeatures(gdf):
-        """Function to parse features from GeoDataFrame in such a manner that rasterio wants them"""
-        import json
-        return [json.loads(gdf.to_json())['features'][0]['geometry']]
-    if verbose:
-      print('Creating mask...')
-    coords = getFeatures(geo)
-    
-    #clip source image using coords
+    #clip all variables, stacked as bands
     if verbose:
       print('Clipping input...')
-    out_img, out_transform = mask(dataset=data, shapes=coords, crop=True)
-    
-    #mask output image
-    out_img[regional_mask==255]=0
-    
-    #copy the metadata
-    out_meta = data.meta.copy()
+    clips=[]
+    for var in variables:
+        with rasterio.open(adems[var]) as data:
+            out_img, out_transform = mask(dataset=data, shapes=coords, crop=True)
+            out_meta = data.meta.copy()
+        clips.append(out_img[0])
+    clips=np.stack(clips)
     
-    out_meta.update({"driver": "GTiff",
-                    "height": out_img.shape[1],
-                    "width": out_img.shape[2],
-                    "transform": out_transform,
-                    "crs": regional_mask.crs})
-    if verbose:
-      print('Saving output...')
-    with rasterio.open(out_tif, "w",compress='deflate', **out_meta) as dest:
-        dest.write(out_img)
-        
-
     if verbose:    
       print('Reprojecting output...')
     dst_crs = regional_mask.crs
-    with rasterio.open(out_tif) as src:
-        transform, width, height = calculate_default_transform(src.crs, dst_crs, 
-                                                                src.width, 
-                                                                src.height, 
-                                                                *src.bounds)
-        kwargs = src.meta.copy()
-        kwargs.update({'crs': dst_crs,'transform': transform, 'width': width,'height': height})
-    
-        with rasterio.open(out_tif_3413, 'w', compress='deflate', **kwargs) as dst:
-                reproject(source=rasterio.band(src, 1),destination=rasterio.band(dst, 1),
-                    src_transform=src.transform,
-                    src_crs=src.crs,
-                    dst_transform=transform,
-                    dst_crs=dst_crs,
-                    resampling=Resampling.nearest)
-    
+    height, width = clips.shape[1:]
+    transform, dst_width, dst_height = calculate_default_transform(dst_crs, dst_crs, 
+                                                                   width, height, 
+                                                                   *array_bounds(height, 
+                                                                                 width, 
+                                                                                 out_transform))
+    output_data=np.zeros((len(variables), dst_height, dst_width), dtype=clips.dtype)
+    reproject(source=clips, destination=output_data,
+              src_transform=out_transform, src_crs=dst_crs, 
+              src_nodata=out_meta['nodata'],
+              dst_transform=transform, dst_crs=dst_crs, 
+              dst_nodata=out_meta['nodata'],
+              resampling=Resampling.nearest)
+    
+    #resample the mask once for all variables, 0 outside the mask footprint
+    #and where the mask has no data (e.g. 255 over the ocean)
     if verbose:
       print('Resampling mask to fit output resolution...')
-    #source
-    src_filename = regional_mask_path
-    src = gdal.Open(src_filename, gdalconst.GA_ReadOnly)
-    src_proj = src.GetProjection()
-    src_geotrans = src.GetGeoTransform()
-    
-    #raster to match
-    match_filename = out_tif_3413
-    match_ds = gdal.Open(match_filename, gdalconst.GA_ReadOnly)
-    match_proj = match_ds.GetProjection()
-    match_geotrans = match_ds.GetGeoTransform()
-    wide = match_ds.RasterXSize
-    high = match_ds.RasterYSize
-    
-    #output/destination
-    dst_filename = outpath+region+'mask_resampled_temp.tif'
-    dst = gdal.GetDriverByName('Gtiff').Create(dst_filename, wide, high, 1, gdalconst.GDT_Float32)
-    dst.SetGeoTransform( match_geotrans )
-    dst.SetProjection( match_proj)
-    
-    #run
-    gdal.ReprojectImage(src, dst, src_proj, match_proj, gdalconst.GRA_NearestNeighbour)
-    
-    del dst # Flush
+    mask_data=np.full((dst_height, dst_width), np.nan, dtype=np.float32)
+    reproject(source=regional_mask.read(1).astype(np.float32), destination=mask_data,
+              src_transform=regional_mask.transform, src_crs=regional_mask.crs,
+              src_nodata=regional_mask.nodata,
+              dst_transform=transform, dst_crs=dst_crs, dst_nodata=np.nan,
+              resampling=Resampling.nearest)
+    mask_data[np.isnan(mask_data)]=0
+    regional_mask.close()
     
     if verbose:
       print('Masking output...')
-    
-    mask=rasterio.open(outpath+region+'mask_resampled_temp.tif')
-    mask_data=mask.read(1)
-    output=rasterio.open(out_tif_3413)
-    output_data=output.read(1)
-    profile_mask=mask.profile
-    profile_output = output.profile #saving metadata
-    output_data[mask.read(1)==0]=0
+    output_data[:, mask_data==0]=0
     mask_data[mask_data==0]=255
-    profile_mask.update(nodata=255)
     
-    if var=='slope':
-        with rasterio.open(outpath+region+'_arcticdem_'+var+'.tif', 'w', **profile_output) as dst:
-            dst.write(output_data, 1)
-        with rasterio.open(outpath+region+'_mask_resampled.tif', 'w', **profile_output) as dst:
-            dst.write(mask_data, 1)
+    profile_output=out_meta
+    profile_output.update({"driver": "GTiff",
+                           "count": 1,
+                           "height": dst_height,
+                           "width": dst_width,
+                           "transform": transform,
+                           "crs": dst_crs,
+                           "compress": 'deflate'})
+    
+    #aspects are circular, overviews can't be averaged
+    outputs={}
+    for i, var in enumerate(variables):
+        outputs[var]=outpath+region+'_arcticdem_'+var+'.tif'
+        write_cog(outputs[var], output_data[i], profile_output, 
+                  resampling='nearest' if var=='aspect' else 'average')
             
-    if var=='aspect':
-        with rasterio.open(outpath+region+'_arcticdem_'+var+'.tif', 'w', **profile_output) as dst:
-            dst.write(output_data, 1)
+    write_cog(outpath+region+'_mask_resampled.tif', 
+              mask_data.astype(profile_output['dtype']), profile_output)
+    
+    return outputs
     
 
+def region_processing(args):
+    '''
+    INPUTS:
+        args: region, path of the regional mask, paths of ArcticDEM files by 
+              variable, output folder and verbose (see 
+              extract_arcticdem_variables()) [tuple]
+        
+    OUTPUTS:
+        region: processed region [string]
+        outputs: paths of the clipped ArcticDEM by variable, None if the 
+                 processing failed [dictionary,NoneType]
     
-    temp=outpath+region+'mask_resampled_temp.tif'
+    '''
     
-    return out_tif,out_tif_3413,temp
+    region, regional_mask, adems, outpath, verbose = args
     
+    try:
+        outputs=extract_arcticdem_variables(adems=adems, region=region, 
+                                            regional_mask=regional_mask, 
+                                            outpath=outpath, verbose=verbose)
+    except Exception as e:
+        print('ERROR: %s failed: %s' %(region, e))
+        outputs=None
+        
+    return region, outputs
 
-import os
+
+def extract_arcticdem_regions(regions, inpath, adems, outpath, 
+                              nb_cores=multiprocessing.cpu_count(), verbose=True):
+    '''
+    Runs extract_arcticdem_variables() for several regions on a pool of 
+    processes. Each process reads its own window of the shared ArcticDEM 
+    files and writes its own outputs.
+    
+    INPUTS:
+        regions: regions to clip [list]
+        inpath: folder containing the regional masks ({region}.tif) [string]
+        adems: paths of ArcticDEM files by variable [dictionary]
+        outpath: folder where to the clipped ArcticDEM [string]
+        nb_cores: number of regions processed at the same time [int]
+        verbose: set to True to print details about processing [boolean]
+        
+    OUTPUTS:
+        results: paths of the clipped ArcticDEM by variable for each region,
+                 None for failed regions [dictionary]
+    
+    '''
+    
+    tasks=[(region, os.path.join(inpath, region+'.tif'), adems, outpath, verbose) 
+           for region in regions]
+    
+    results={}
+    
+    with Pool(min(nb_cores, len(tasks))) as p:
+        for region, outputs in p.imap_unordered(region_processing, tasks):
+            results[region]=outputs
+            if verbose:
+                print('%s done (%d/%d)' %(region, len(results), len(tasks)))
+                
+    return results
+    
 
 regions= ['Greenland','Iceland', 'Svalbard', 'FransJosefLand', 'NovayaZemlya',
           'SevernayaZemlya', 'JanMayen', 'NorthernArcticCanada', 
           'SouthernArcticCanada']
 
 inpath='/srv/home/8675309/AW/masks/'
+inpath_adem='/srv/home/8675309/AW/arctic_dem/'
+variables=['slope', 'aspect']
+outpath='/srv/home/8675309/AW/'
+nb_cores=multiprocessing.cpu_count()
 verbose=True
 
-for reg in regions:
-    
-    region_path=inpath+reg+'.tif'
-    out_tif,out_tif_3413,temp=extract_arcticdem(regional_mask=region_path,region=reg)
-    print('Deleting temporary outputs...')
-    os.remove(out_tif)
-    os.remove(out_tif_3413)
-    os.remove(temp)
-    out_tif,out_tif_3413,temp=extract_arcticdem(adem='/srv/home/8675309/AW/arctic_dem/aspect.img',
-                                                regional_mask=region_path,
-                                                region=reg)
-    if verbose:
-      print('Deleting temporary outputs...')
-    os.remove(out_tif)
-    os.remove(out_tif_3413)
-    os.remove(temp)
-    
-    if verbose:
-      for i in range(4):
-          print('\n')
+
+if __name__=='__main__':
+    
+    parser = argparse.ArgumentParser(description='Clip ArcticDEM derived variables '
+                                     'for several regions in parallel')
+    parser.add_argument('--regions', nargs='+', default=regions)
+    parser.add_argument('--inpath', default=inpath, 
+                        help='folder containing the regional masks')
+    parser.add_argument('--inpath_adem', default=inpath_adem,
+                        help='folder containing {variable}.img ArcticDEM files')
+    parser.add_argument('--variables', nargs='+', default=variables, 
+                        choices=['slope', 'aspect', 'elevation'])
+    parser.add_argument('--outpath', default=outpath)
+    parser.add_argument('--nb_cores', type=int, default=nb_cores)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+    
+    adems={var: os.path.join(args.inpath_adem, var+'.img') for var in args.variables}
+    
+    results=extract_arcticdem_regions(args.regions, args.inpath, adems, args.outpath,
+                                      nb_cores=args.nb_cores, verbose=not args.quiet)
+    
+    failed=[region for region, outputs in results.items() if outputs is None]
+    if failed:
+        print('Failed regions: %s' %', '.join(failed))
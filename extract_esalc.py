@@ -8,16 +8,363 @@ resulting .tif file to be used as a SICE mask.
 
 Iceland, Svalbard, FransJosefLand, NovayaZemlya, SevernayaZemlya, JanMayen, 
 NorthernArcticCanada, SouthernArcticCanada, Norway, Beaufort and AntarcticPeninsula 
-are currently implemented.
+are currently implemented. Region bounding boxes are stored in SICE_regions.csv.
 
-Function is run in default mode at the end of the script.
+Function is run in default mode at the end of the script. Set batch to True to 
+run all the regions at once from a single opening of the ESALC map. Set direct
+to True to warp in memory and only write the SICE masks, optionally snapped to 
+an existing SICE grid.
 
-WARNING: all the variables temporary stored in memory will be cleared to enable 
-the deletion of temporary outputs. 
+Datasets are closed as soon as they are used to enable the deletion of 
+temporary outputs.
 
 """
 
+import os
 
+regions_registry=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'SICE_regions.csv')
+
+
+def get_region_bbox(region, source_crs='EPSG:4326', regions_registry=regions_registry):
+    '''
+    INPUTS:
+        region: region to clip [string]
+        source_crs: CRS of the bounding box [string]
+        regions_registry: path of the csv file containing region bounding boxes [string]
+        
+    OUTPUTS:
+        bbox: bounding box of the region, None if not implemented [shapely.geometry.Polygon]
+    
+    '''
+    
+    import pandas as pd
+    from shapely.geometry import box
+    
+    registry = pd.read_csv(regions_registry)
+    
+    bounds = registry[(registry['region']==region) & (registry['source_crs']==source_crs)]
+    
+    if len(bounds)==0:
+        return None
+    
+    minx, miny, maxx, maxy = bounds[['minx', 'miny', 'maxx', 'maxy']].values[0]
+    
+    return box(minx, miny, maxx, maxy)
+
+
+def get_class_LUT(region, binary_mask=False, mapping_file=None, verbose=True):
+    '''
+    Builds the lookup table converting ESA Land Classes to SICE mask values, 
+    so that any conversion is a single indexing pass.
+    
+    ESA LC:
+        210: ocean
+        0: out of footprint
+        60-90(10)/100-150(10)/122/180/200-220(10): land 
+    
+    SICE MASK:
+        255: ocean
+        2: land
+    
+    INPUTS:
+        region: region of the ESA Land Classes [string]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file with esalc_class and mask_value columns
+                      for custom class groupings (see esalc_custom_mask.csv), 
+                      classes not listed being set to 255. Overrides 
+                      binary_mask if given [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
+    
+    OUTPUTS:
+        lut: SICE mask value of each of the 256 ESA Land Classes [array]
+    
+    '''
+    
+    import numpy as np
+    import pandas as pd
+    
+    if mapping_file is not None:
+        mapping = pd.read_csv(mapping_file, comment='#')
+        lut = np.full(256, 255, dtype=np.uint8)
+        lut[mapping['esalc_class'].values] = mapping['mask_value'].values
+        return lut
+    
+    #identity for the full ESALC mask
+    lut = np.arange(256, dtype=np.uint8)
+    
+    if region=='BeaufortSea':
+        if verbose and not binary_mask:
+          print('BeaufortSea mask could only be binary (covers ocean only)')
+        lut[:] = 255
+        lut[210] = 2
+    
+    else:
+        if binary_mask:
+            lut[:] = 2
+        lut[[0, 210]] = 255
+    
+    return lut
+
+
+def esalc_class_to_SICEMask(esalc, region, binary_mask=False, mapping_file=None,
+                            verbose=True):
+    '''
+    INPUTS:
+        esalc: ESA Land Classes [array]
+        region: region of the ESA Land Classes [string]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
+    
+    OUTPUTS:
+        mask_esalc: SICE useable mask [array]
+    
+    '''
+    
+    lut = get_class_LUT(region, binary_mask=binary_mask, mapping_file=mapping_file,
+                        verbose=verbose)
+    
+    return lut[esalc]
+
+
+def remap_classes(src_filename, dst_filename, lut):
+    '''
+    Applies a class lookup table block by block, so that large or tiled 
+    inputs are never fully loaded.
+    
+    INPUTS:
+        src_filename: path of the ESA Land Classes raster [string]
+        dst_filename: path of the output mask [string]
+        lut: lookup table, see get_class_LUT() [array]
+    
+    OUTPUTS:
+        {dst_filename}: remapped raster, 255 being no data [.tif]
+    
+    '''
+    
+    import rasterio
+    from sice_cog import get_cog_profile, add_overviews
+    
+    with rasterio.open(src_filename) as src:
+        profile = get_cog_profile(src.profile)
+        profile.update(dtype='uint8', count=1, nodata=255)
+        
+        with rasterio.open(dst_filename, 'w', **profile) as dst:
+            for _, window in src.block_windows(1):
+                dst.write(lut[src.read(1, window=window)], 1, window=window)
+    
+    add_overviews(dst_filename)
+
+
+def get_region_window(data, bbox):
+    '''
+    INPUTS:
+        data: ESA Land Classes [rasterio.io.DatasetReader]
+        bbox: bounding box of the region in EPSG:4326 [shapely.geometry.Polygon]
+        
+    OUTPUTS:
+        window: window of data covering bbox [rasterio.windows.Window]
+    
+    '''
+    
+    from rasterio.windows import Window, from_bounds
+    from rasterio.warp import transform_bounds
+    
+    #bbox to the raster crs (see extract_esalc), then to a window
+    bounds = transform_bounds('EPSG:4326', data.crs, *bbox.bounds)
+    window = from_bounds(*bounds, transform=data.transform)
+    window = window.round_offsets().round_lengths()
+    
+    return window.intersection(Window(0, 0, data.width, data.height))
+
+
+def get_target_grid(data, window, target_crs='EPSG:3413', snap_to=None):
+    '''
+    INPUTS:
+        data: ESA Land Classes [rasterio.io.DatasetReader]
+        window: window of data to warp [rasterio.windows.Window]
+        target_crs: Output CRS [string]
+        snap_to: path of an existing SICE raster whose grid is used as the 
+                 target grid, set to None to derive the grid from window [string]
+        
+    OUTPUTS:
+        crs: CRS of the target grid [rasterio.crs.CRS,string]
+        transform: affine transform of the target grid [affine.Affine]
+        width: number of columns of the target grid [int]
+        height: number of rows of the target grid [int]
+    
+    '''
+    
+    import rasterio
+    from rasterio.windows import bounds
+    from rasterio.warp import calculate_default_transform
+    
+    if snap_to is not None:
+        with rasterio.open(snap_to) as grid:
+            return grid.crs, grid.transform, grid.width, grid.height
+    
+    transform, width, height = calculate_default_transform(data.crs, target_crs,
+                                                           int(window.width),
+                                                           int(window.height),
+                                                           *bounds(window, data.transform))
+    
+    return target_crs, transform, width, height
+
+
+def warp_esalc_to_SICEMask(esalc, src_transform, src_crs, region, outpath, 
+                           target_grid, binary_mask=False, mapping_file=None,
+                           verbose=True):
+    '''
+    Warps a clipped ESALC to the target grid in memory and converts it to a 
+    SICE mask, only the final mask being written.
+    
+    INPUTS:
+        esalc: clipped ESA Land Classes [array]
+        src_transform: affine transform of esalc [affine.Affine]
+        src_crs: CRS of esalc [rasterio.crs.CRS]
+        region: region of esalc [string]
+        outpath: folder where to store outputs [string]
+        target_grid: (crs, transform, width, height) of the output grid, see 
+                     get_target_grid() [tuple]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
+    
+    OUTPUTS:
+        {outpath}/{region}.tif: binary or ESALC SICE useable mask [.tif]
+        SICEmask_tif: path of the SICE mask [string]
+    
+    '''
+    
+    import numpy as np
+    import rasterio
+    from rasterio.warp import reproject, Resampling
+    from sice_cog import write_cog
+    
+    SICEmask_tif=outpath+region+'.tif'
+    dst_crs, dst_transform, width, height = target_grid
+    
+    if verbose:
+      print('%s: warping to target grid...' %region)
+    
+    #pixels out of the source footprint are set to 0 (out of footprint class)
+    esalc_warped=np.zeros((height, width), dtype=np.uint8)
+    reproject(source=esalc, destination=esalc_warped,
+              src_transform=src_transform, src_crs=src_crs, src_nodata=None,
+              dst_transform=dst_transform, dst_crs=dst_crs, dst_nodata=None,
+              resampling=Resampling.nearest)
+    
+    mask_esalc=esalc_class_to_SICEMask(esalc_warped, region, binary_mask=binary_mask,
+                                       mapping_file=mapping_file, verbose=verbose)
+    
+    profile={'driver': 'GTiff', 'dtype': 'uint8', 'count': 1, 'nodata': 255,
+             'width': width, 'height': height, 'crs': dst_crs, 
+             'transform': dst_transform}
+    
+    if verbose:
+      print('%s: saving SICE mask...' %region)
+    write_cog(SICEmask_tif, mask_esalc, profile)
+    
+    return SICEmask_tif
+
+
+def esalc_to_SICEMask(out_img, out_meta, region, outpath, source_crs='EPSG:4326',
+                      target_crs='EPSG:3413', to_SICEMask=True, binary_mask=False,
+                      mapping_file=None, verbose=True):
+    '''
+    Saves, reprojects and converts a clipped ESALC to a SICE mask.
+    
+    INPUTS:
+        out_img: clipped ESA Land Classes [array]
+        out_meta: metadata of the clipped ESA Land Classes [dictionary]
+        region: region to clip [string]
+        outpath: folder where to store outputs [string]
+        source_crs: CRS of ESA Land Classes [string]
+        target_crs: Output CRS [string]
+        to_SICEMask: set to True to have a SICE useable mask as output [boolean]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
+    
+    OUTPUTS:
+        {outpath}/esalc_clipped_{region}.tif: clipped ESALC [.tif]
+        {outpath}/esalc_clipped_{target_crs}_{region}.tif: clipped and reprojected
+                                                           ESALC [.tif]
+        if to_SICEMASK set to True:
+            {outpath}/{region}.tif: binary or ESALC SICE useable mask [.tif]
+    
+    '''
+    
+    import numpy as np
+    import rasterio
+    from rasterio.transform import array_bounds
+    from rasterio.warp import calculate_default_transform, reproject, Resampling
+    from sice_cog import write_cog
+    
+    #initialize output names
+    target_crs_name=target_crs.split(':')[1]
+    out_tif=outpath+'esalc_clipped_'+region+'.tif'
+    out_tif_3413=outpath+'esalc_clipped_'+target_crs_name+'_'+region+'.tif'
+    SICEmask_tif=outpath+region+'.tif'
+    
+    if verbose:
+      print('Saving output...')
+    write_cog(out_tif, out_img, out_meta)
+        
+
+    if source_crs != target_crs:
+        if verbose:
+          print('Reprojecting output...')
+        dst_crs = target_crs
+        height, width = out_img.shape[1:]
+        transform, dst_width, dst_height = calculate_default_transform(out_meta['crs'], dst_crs, 
+                                                                       width, height, 
+                                                                       *array_bounds(height, 
+                                                                                     width, 
+                                                                                     out_meta['transform']))
+        kwargs = out_meta.copy()
+        kwargs.update({'crs': dst_crs,'transform': transform, 'width': dst_width,'height': dst_height})
+        
+        out_img_3413 = np.zeros((dst_height, dst_width), dtype=out_img.dtype)
+        reproject(source=out_img[0], destination=out_img_3413,
+                  src_transform=out_meta['transform'],
+                  src_crs=out_meta['crs'],
+                  src_nodata=out_meta.get('nodata'),
+                  dst_transform=transform,
+                  dst_crs=dst_crs,
+                  dst_nodata=out_meta.get('nodata'),
+                  resampling=Resampling.nearest)
+        write_cog(out_tif_3413, out_img_3413, kwargs)
+    
+    
+    if to_SICEMask:
+        '''
+        ESA LC:
+            210: ocean
+            0: out of footprint
+            60-90(10)/100-150(10)/122/180/200-220(10): land 
+        
+        SICE MASK:
+            255: ocean
+            2: land
+        '''
+        
+        print('Converting output to SICE mask...')
+        lut=get_class_LUT(region, binary_mask=binary_mask, mapping_file=mapping_file,
+                          verbose=verbose)
+        
+        if verbose:
+          print('Saving SICE mask...')
+        remap_classes(out_tif_3413, SICEmask_tif, lut)
+            
+    return out_tif, out_tif_3413
 
 
 def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-v2.1.data/lccs_class.img',
@@ -28,6 +375,7 @@ def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-
                   clean_temp_files=True,
                   to_SICEMask=True,
                   binary_mask=False,
+                  mapping_file=None,
                   verbose=True):
     '''
     INPUTS:
@@ -39,6 +387,8 @@ def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-
         to_SICEMask: set to True to have a SICE useable mask as output [boolean]
         binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
                      if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
         verbose: set to True to print details about processing [boolean]
     
     OUTPUTS:
@@ -60,17 +410,10 @@ def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-
     
     
     import rasterio
-    from shapely.geometry import box
     import geopandas as gpd
     from fiona.crs import from_epsg
     from rasterio.mask import mask
-    from rasterio.warp import calculate_default_transform, reproject, Resampling
     import os
-    from IPython import get_ipython
-    
-    
-    #clear all variables to enable file deletion
-    get_ipython().magic('reset -sf') 
         
     #initialize output names
     target_crs_name=target_crs.split(':')[1]
@@ -99,101 +442,12 @@ def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-
     data = rasterio.open(esa_lc)
     
     
-    if source_crs=='EPSG:4326':
-        
-        if region=='Greenland':
-            minx, miny =  -80.35, 56.33
-            maxx, maxy = -3.17, 84.17
-            bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='Iceland':
-            minx, miny = -24.93, 63.18
-            maxx, maxy = -12.8, 66.6
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='Svalbard':
-            minx, miny = 7.65, 76.18
-            maxx, maxy = 37.3, 80.84
-            bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='NovayaZemlya':
-            minx, miny = 47.64, 70.4
-            maxx, maxy = 70.96, 77.22
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='FransJosefLand':
-            minx, miny = 40.88, 79.85
-            maxx, maxy = 71.66, 81.93
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='SevernayaZemlya':
-            minx, miny = 82.77, 78.00
-            maxx, maxy = 112.26, 83.11
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='JanMayen':
-            minx, miny = -9.47, 70.77
-            maxx, maxy = -7.45, 71.21
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='NorthernArcticCanada':
-            minx, miny = -128.27, 73.78
-            maxx, maxy = -57.69, 83.24
-            bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='SouthernArcticCanada':
-            minx, miny = -92.23, 61.19
-            maxx, maxy = -60.96, 74.43
-            bbox = box(minx, miny, maxx, maxy)
-        
-        elif region=='Norway':
-            minx, miny = 4.49, 59.44
-            maxx, maxy = 9.08, 62.12
-            bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='Beaufort':
-            minx, miny = -148.87, 68.28
-            maxx, maxy = -122.28, 75.39
-            bbox = box(minx, miny, maxx, maxy) 
-            
-        elif region=='AntarcticPeninsula':
-            minx, miny = -78.23, -74.76
-            maxx, maxy = -49.23, -57.98
-            bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='AlaskaYukon':
-            minx, miny = -158.07, 54.96
-            maxx, maxy = -127.22, 64.42
-            bbox = box(minx, miny, maxx, maxy)
-            
-        else:
-            if verbose:
-              print('Wrong region name or not implemented')
-            return
-            
-            
-    elif source_crs=='EPSG:3413':
-        
-        if region=='Iceland':
-                minx, miny = 825968.82, -2422134.15
-                maxx, maxy = 1405420.90, -2377180.81
-                bbox = box(minx, miny, maxx, maxy)
-            
-        elif region=='Svalbard':
-            minx, miny = 7.65, 76.18
-            maxx, maxy = 37.3, 80.84
-            bbox = box(minx, miny, maxx, maxy)
-                
-        elif region=='Novaya Zemlya':
-            minx, miny = 47.64, 70.4
-            maxx, maxy = 70.96, 77.22
-            bbox = box(minx, miny, maxx, maxy)
-        
-        else:
-            if verbose:
-              print('Wrong region name or not implemented')
-            return
-            
+    bbox=get_region_bbox(region, source_crs=source_crs)
+    
+    if bbox is None:
+        if verbose:
+          print('Wrong region name or not implemented')
+        return
         
     
     
@@ -227,94 +481,226 @@ def extract_esalc(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-
                     "transform": out_transform,
                     "crs": data.crs})
     
-    if verbose:
-      print('Saving output...')
-    with rasterio.open(out_tif, "w",compress='deflate', **out_meta) as dest:
-        dest.write(out_img)
+    data.close()
+    
+    esalc_to_SICEMask(out_img, out_meta, region, outpath, source_crs=source_crs,
+                      target_crs=target_crs, to_SICEMask=to_SICEMask, 
+                      binary_mask=binary_mask, mapping_file=mapping_file, 
+                      verbose=verbose)
+    
+    if to_SICEMask:
+        return out_tif, out_tif_3413, clean_temp_files,to_SICEMask
         
-
-    if source_crs != target_crs:
-        if verbose:
-          print('Reprojecting output...')
-        dst_crs = target_crs
-        with rasterio.open(out_tif) as src:
-            transform, width, height = calculate_default_transform(src.crs, dst_crs, 
-                                                                    src.width, 
-                                                                    src.height, 
-                                                                    *src.bounds)
-            kwargs = src.meta.copy()
-            kwargs.update({'crs': dst_crs,'transform': transform, 'width': width,'height': height})
         
-            with rasterio.open(out_tif_3413, 'w', compress='deflate', **kwargs) as dst:
-                    reproject(source=rasterio.band(src, 1),destination=rasterio.band(dst, 1),
-                        src_transform=src.transform,
-                        src_crs=src.crs,
-                        dst_transform=transform,
-                        dst_crs=dst_crs,
-                        resampling=Resampling.nearest)
+def extract_esalc_direct(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-v2.1.data/lccs_class.img',
+                         source_crs='EPSG:4326',
+                         region='Iceland',
+                         outpath='/srv/home/8675309/AW/',
+                         target_crs='EPSG:3413',
+                         binary_mask=False,
+                         mapping_file=None,
+                         snap_to=None,
+                         verbose=True):
+    '''
+    Same as extract_esalc() with to_SICEMask set to True, but the region is 
+    read through a window and warped to the target grid in memory: no 
+    temporary outputs are written.
+    
+    INPUTS:
+        esa_lc: path of ESA Land Classes .img file [string]
+        source_crs: CRS of ESA Land Classes, default to 4326 [string]
+        region: region to clip [string]
+        outpath: folder where to store outputs [string]
+        target_crs: Output CRS, ignored if snap_to is given [string]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
+        snap_to: path of an existing SICE raster (e.g. a SICE scene of the 
+                 region) whose grid is used as the target grid so that the mask 
+                 aligns exactly with it. If None, the grid is derived from the 
+                 region bounding box [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
     
+    OUTPUTS:
+        {outpath}/{region}.tif: binary or ESALC (depending on binary_mask option) 
+                                SICE useable mask for the selected region [.tif]
+        SICEmask_tif: path of the SICE mask [string]
     
-    if to_SICEMask:
-        '''
-        ESA LC:
-            210: ocean
-            0: out of footprint
-            60-90(10)/100-150(10)/122/180/200-220(10): land 
+    '''
+    
+    import rasterio
+    from rasterio.warp import transform_bounds
+    from shapely.geometry import box
+    
+    data = rasterio.open(esa_lc)
+    
+    if snap_to is not None:
+        #region covered by the grid to snap to
+        with rasterio.open(snap_to) as grid:
+            bbox = box(*transform_bounds(grid.crs, 'EPSG:4326', *grid.bounds,
+                                         densify_pts=21))
+    else:
+        bbox = get_region_bbox(region, source_crs=source_crs)
+    
+    if bbox is None:
+        if verbose:
+          print('Wrong region name or not implemented')
+        data.close()
+        return
+    
+    window = get_region_window(data, bbox)
+    
+    if verbose:
+      print('Clipping input...')
+    esalc = data.read(1, window=window)
+    src_transform = data.window_transform(window)
+    target_grid = get_target_grid(data, window, target_crs=target_crs, 
+                                  snap_to=snap_to)
+    src_crs = data.crs
+    
+    data.close()
+    
+    return warp_esalc_to_SICEMask(esalc, src_transform, src_crs, region, outpath,
+                                  target_grid, binary_mask=binary_mask, 
+                                  mapping_file=mapping_file, verbose=verbose)
+
+
+def extract_esalc_batch(esa_lc='/srv/home/8675309/AW/C3S-LC-L4-LCCS-Map-300m-P1Y-2018-v2.1.data/lccs_class.img',
+                        regions=None,
+                        source_crs='EPSG:4326',
+                        outpath='/srv/home/8675309/AW/',
+                        target_crs='EPSG:3413',
+                        clean_temp_files=True,
+                        to_SICEMask=True,
+                        binary_mask=False,
+                        mapping_file=None,
+                        direct=False,
+                        snap_to=None,
+                        nb_threads=4,
+                        verbose=True):
+    '''
+    Runs several regions from a single opening of the ESALC map. Each region
+    is a windowed read of the map, regions being processed in parallel.
+    
+    INPUTS:
+        esa_lc: path of ESA Land Classes .img file [string]
+        regions: regions to clip, set to None to run all the regions of 
+                 SICE_regions.csv [list,NoneType]
+        source_crs: CRS of ESA Land Classes, default to 4326 [string]
+        outpath: folder where to store outputs [string]
+        target_crs: Output CRS [string]
+        clean_temp_files: set to True to delete temporary outputs [boolean]
+        to_SICEMask: set to True to have a SICE useable mask as output [boolean]
+        binary_mask: set to True to have a SICE useable binary mask (land/ocean) 
+                     if False, mask contains the 22 ESALC [boolean]
+        mapping_file: path of a csv file for custom class groupings, see 
+                      get_class_LUT() [string,NoneType]
+        direct: set to True to warp regions in memory and only write the SICE 
+                masks, see extract_esalc_direct() [boolean]
+        snap_to: paths of existing SICE rasters whose grids are used as target 
+                 grids when direct is True, per region [dictionary,NoneType]
+        nb_threads: number of regions processed at the same time [int]
+        verbose: set to True to print details about processing [boolean]
+    
+    OUTPUTS:
+        same as extract_esalc() for each region
+        processed_regions: regions successfully processed [list]
+    
+    '''
+    
+    import threading
+    import pandas as pd
+    import rasterio
+    from concurrent.futures import ThreadPoolExecutor
+    
+    if regions is None:
+        registry = pd.read_csv(regions_registry)
+        regions = list(registry['region'][registry['source_crs']==source_crs])
+    
+    if snap_to is None:
+        snap_to = {}
+    
+    data = rasterio.open(esa_lc)
+    
+    #a dataset can only be read by one thread at a time
+    lock = threading.Lock()
+    
+    def process_region(region):
         
-        SICE MASK:
-            255: ocean
-            2: land
-        '''
+        bbox=get_region_bbox(region, source_crs=source_crs)
         
-        print('Converting output to SICE mask...')
-        esalc_tp=rasterio.open(out_tif_3413)
-        esalc=esalc_tp.read(1)
+        if bbox is None:
+            if verbose:
+              print('%s: wrong region name or not implemented' %region)
+            return None
         
-        if binary_mask:
-            if region!='BeaufortSea':
-                mask_esalc=esalc.copy()
-                mask_esalc[(mask_esalc!=210) & (mask_esalc!=0)]=2
-                mask_esalc[mask_esalc!=2]=255
-            else:
-                mask_esalc=esalc.copy()
-                mask_esalc[(mask_esalc==210) & (mask_esalc!=0)]=2
-                mask_esalc[mask_esalc!=2]=255
-            
-        elif not binary_mask:
-            if region!='BeaufortSea':
-                mask_esalc=esalc.copy()
-                mask_esalc[mask_esalc==210]=255
-                mask_esalc[mask_esalc==0]=255
-            else:
-                if verbose:
-                  print('BeaufortSea mask could only be binary (covers ocean only)')
-                mask_esalc=esalc.copy()
-                mask_esalc[(mask_esalc==210) & (mask_esalc!=0)]=2
-                mask_esalc[mask_esalc!=2]=255
+        window = get_region_window(data, bbox)
         
         if verbose:
-          print('Saving SICE mask...')
-        profile = esalc_tp.profile 
-        profile.update(nodata=255) 
+          print('%s: clipping input...' %region)
+        with lock:
+            out_img = data.read(window=window)
         
-        with rasterio.open(SICEmask_tif, 'w', **profile) as dst:
-            dst.write(mask_esalc, 1)
-            
+        if direct:
+            target_grid = get_target_grid(data, window, target_crs=target_crs,
+                                          snap_to=snap_to.get(region))
+            warp_esalc_to_SICEMask(out_img[0], data.window_transform(window), data.crs,
+                                   region, outpath, target_grid, 
+                                   binary_mask=binary_mask, 
+                                   mapping_file=mapping_file, verbose=verbose)
+            return region
         
-        return out_tif, out_tif_3413, clean_temp_files,to_SICEMask
+        out_meta = data.meta.copy()
+        out_meta.update({"driver": "GTiff",
+                        "height": out_img.shape[1],
+                        "width": out_img.shape[2],
+                        "transform": data.window_transform(window),
+                        "crs": data.crs})
+        
+        out_tif, out_tif_3413 = esalc_to_SICEMask(out_img, out_meta, region, outpath, 
+                                                  source_crs=source_crs, 
+                                                  target_crs=target_crs, 
+                                                  to_SICEMask=to_SICEMask, 
+                                                  binary_mask=binary_mask, 
+                                                  mapping_file=mapping_file,
+                                                  verbose=verbose)
+        
+        #turn temporary outputs to final if SICEMask isn't needed
+        if clean_temp_files and to_SICEMask:
+            os.remove(out_tif)
+            os.remove(out_tif_3413)
+        
+        return region
+    
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        processed_regions = [region for region in executor.map(process_region, regions)
+                             if region is not None]
+    
+    data.close()
+    
+    return processed_regions
         
         
 verbose=True
+batch=False
+direct=False
+
+if batch:
+    extract_esalc_batch(direct=direct, verbose=verbose)
 
-out_tif, out_tif_3413, clean_temp_files,to_SICEMASK=extract_esalc()
+elif direct:
+    extract_esalc_direct(verbose=verbose)
 
-#turn temporary outputs to final if SICEMask isn't needed
-if not to_SICEMASK:
-    clean_temp_files=False
+else:
+    out_tif, out_tif_3413, clean_temp_files,to_SICEMASK=extract_esalc()
     
-if clean_temp_files:
-    if verbose:
-      print('Deleting temporary outputs...')
-    import os
-    os.remove(out_tif)
-    os.remove(out_tif_3413)
+    #turn temporary outputs to final if SICEMask isn't needed
+    if not to_SICEMASK:
+        clean_temp_files=False
+        
+    if clean_temp_files:
+        if verbose:
+          print('Deleting temporary outputs...')
+        os.remove(out_tif)
+        os.remove(out_tif_3413)
@@ -0,0 +1,393 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
+
+
+Extracts raster values along lines (transects) and at points (e.g. AWS sites)
+from many rasters and dates at once, without the GUI. The profile logic is
+shared with sice_tools_gui.py.
+
+Lines and points are listed in a .csv file with the columns id, x0, y0, x1 and
+y1, x1 and y1 being left empty for points. Coordinates are given in
+features_crs and transformed to the CRS of each raster in a single vectorized
+call. Only the windows around the features are read, and rasters are processed
+in parallel. All the samples are written in a single tidy table, one row per
+raster, feature and sample.
+
+Function is run in default mode at the end of the script. The script can also
+be run from the command line, e.g.:
+    python extract_profiles.py --features AWS.csv --rasters 2019-*/albedo_bb_planar_sw.tif
+                               --features_crs EPSG:4326 --output AWS_albedo.csv
+
+
+INPUTS:
+    features_file: path of the .csv file listing lines and points [string]
+    rasters: paths of the rasters, or path of a .txt file listing them one
+             per line [list,string]
+    features_crs: CRS of the feature coordinates, set to None if the features
+                  are given in the CRS of the rasters [string,NoneType]
+    interpolation: 'nearest' or 'bilinear' [string]
+    nb_cores: number of rasters processed at the same time [int]
+    output_file: path of the output .csv file [string]
+
+OUTPUTS:
+    {output_file}: columns raster, date (from the date folder of the raster,
+                   empty otherwise), id, type ('point' or 'profile'),
+                   sample, distance (in meters along the line), x, y (in the
+                   CRS of the raster) and value [.csv]
+
+"""
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.windows import Window
+import scipy.ndimage
+import math
+import os
+import argparse
+import multiprocessing
+from multiprocessing import Pool
+import time
+
+
+time_it=True
+verbose=True
+
+features_file='/srv/home/8675309/AW/AWS_sites.csv'
+rasters='/srv/home/8675309/AW/rasters.txt'
+features_crs='EPSG:4326'
+interpolation='bilinear'
+nb_cores=multiprocessing.cpu_count()
+output_file='/srv/home/8675309/AW/AWS_sites_samples.csv'
+
+
+
+def extract_profile(src, x0, y0, x1, y1, interpolation='bilinear', margin=2):
+    '''
+    Extracts the values of a raster along a line, reading only the window
+    around the line.
+
+    INPUTS:
+        src: opened raster [rasterio.io.DatasetReader]
+        x0, y0, x1, y1: georeferenced coordinates of the line ends [float]
+        interpolation: 'nearest' or 'bilinear' [string]
+        margin: number of pixels read around the line [int]
+
+    OUTPUTS:
+        distances: distance of the samples along the line, one sample per
+                   pixel [array]
+        zi: raster values along the line, NaN outside the raster [array]
+
+    '''
+
+    orders={'nearest': 0, 'bilinear': 1}
+
+    #one sample per pixel
+    distance=math.hypot(x1-x0, y1-y0)
+    num=max(int(math.ceil(distance/min(src.res))), 1)+1
+
+    #fractional pixel coordinates, pixel centers on integers
+    col0, row0 = ~src.transform*(x0, y0)
+    col1, row1 = ~src.transform*(x1, y1)
+    rows=np.linspace(row0, row1, num)-0.5
+    cols=np.linspace(col0, col1, num)-0.5
+
+    #window around the line, clipped to the raster
+    row_start=max(int(math.floor(rows.min()))-margin, 0)
+    row_stop=min(int(math.ceil(rows.max()))+margin+1, src.height)
+    col_start=max(int(math.floor(cols.min()))-margin, 0)
+    col_stop=min(int(math.ceil(cols.max()))+margin+1, src.width)
+
+    if row_start>=row_stop or col_start>=col_stop:
+        return np.linspace(0, distance, num), np.full(num, np.nan)
+
+    window=Window.from_slices((row_start, row_stop), (col_start, col_stop))
+
+    rdata=src.read(1, window=window).astype(np.float64)
+    if src.nodata is not None:
+        rdata[rdata==src.nodata]=np.nan
+
+    zi=scipy.ndimage.map_coordinates(rdata, np.vstack((rows-window.row_off,
+                                                       cols-window.col_off)),
+                                     order=orders[interpolation],
+                                     mode='constant', cval=np.nan)
+
+    return np.linspace(0, distance, num), zi
+
+
+
+def sample_points(src, xs, ys, interpolation='bilinear'):
+    '''
+    Extracts the values of a raster at several points. Pixel coordinates are
+    computed for all the points at once, and a 2x2 window is read around each
+    point inside the raster.
+
+    INPUTS:
+        src: opened raster [rasterio.io.DatasetReader]
+        xs, ys: georeferenced coordinates of the points [array]
+        interpolation: 'nearest' or 'bilinear' [string]
+
+    OUTPUTS:
+        values: raster values at the points, NaN outside the raster [array]
+
+    '''
+
+    orders={'nearest': 0, 'bilinear': 1}
+
+    #fractional pixel coordinates, pixel centers on integers
+    cols, rows = ~src.transform*(np.asarray(xs, dtype=np.float64),
+                                 np.asarray(ys, dtype=np.float64))
+    rows=rows-0.5
+    cols=cols-0.5
+
+    values=np.full(len(rows), np.nan)
+
+    #points within the raster footprint, pixel edges being at -0.5 and size-0.5
+    inside=np.where((rows>=-0.5) & (rows<src.height-0.5) &
+                    (cols>=-0.5) & (cols<src.width-0.5))[0]
+
+    for i in inside:
+
+        #2x2 window around the point, clipped to the raster
+        row_start=max(int(math.floor(rows[i])), 0)
+        row_stop=min(int(math.floor(rows[i]))+2, src.height)
+        col_start=max(int(math.floor(cols[i])), 0)
+        col_stop=min(int(math.floor(cols[i]))+2, src.width)
+
+        window=Window.from_slices((row_start, row_stop), (col_start, col_stop))
+
+        rdata=src.read(1, window=window).astype(np.float64)
+        if src.nodata is not None:
+            rdata[rdata==src.nodata]=np.nan
+
+        values[i]=scipy.ndimage.map_coordinates(rdata, [[rows[i]-row_start],
+                                                        [cols[i]-col_start]],
+                                                order=orders[interpolation],
+                                                mode='nearest')[0]
+
+    return values
+
+
+
+def read_features(features_file):
+    '''
+
+    INPUTS:
+        features_file: path of the .csv file with the columns id, x0, y0, x1
+                       and y1, x1 and y1 being empty for points [string]
+
+    OUTPUTS:
+        features: lines and points, with a type column ('point' or
+                  'profile') [pandas.DataFrame]
+
+    '''
+
+    features=pd.read_csv(features_file)
+
+    for column in ['x1', 'y1']:
+        if column not in features.columns:
+            features[column]=np.nan
+
+    features['type']=np.where(features['x1'].isnull() | features['y1'].isnull(),
+                              'point', 'profile')
+
+    return features
+
+
+
+def transform_features(features, features_crs, dst_crs):
+    '''
+    Transforms the line ends and points to the CRS of a raster in a single
+    call.
+
+    INPUTS:
+        features: lines and points, see read_features() [pandas.DataFrame]
+        features_crs: CRS of the feature coordinates, None if already in
+                      dst_crs [string,NoneType]
+        dst_crs: CRS of the raster [rasterio.crs.CRS]
+
+    OUTPUTS:
+        coords: x0, y0, x1 and y1 in dst_crs [dictionary]
+
+    '''
+
+    from rasterio.warp import transform
+
+    coords={column: features[column].values.astype(np.float64)
+            for column in ['x0', 'y0', 'x1', 'y1']}
+
+    if features_crs is None:
+        return coords
+
+    #starts and ends transformed together
+    nb_features=len(features)
+    profiles=(features['type']=='profile').values
+    xs=np.concatenate((coords['x0'], coords['x1'][profiles]))
+    ys=np.concatenate((coords['y0'], coords['y1'][profiles]))
+
+    xs, ys = transform(features_crs, dst_crs, xs, ys)
+    xs=np.asarray(xs)
+    ys=np.asarray(ys)
+
+    coords['x0'], coords['y0'] = xs[:nb_features], ys[:nb_features]
+    coords['x1'][profiles], coords['y1'][profiles] = xs[nb_features:], ys[nb_features:]
+
+    return coords
+
+
+
+def raster_processing(args):
+    '''
+
+    INPUTS:
+        args: path of the raster, features (see read_features()),
+              features_crs and interpolation [tuple]
+
+    OUTPUTS:
+        samples: samples of all the features in the raster, None if the
+                 raster could not be read or if there is no feature
+                 [pandas.DataFrame,NoneType]
+
+    '''
+
+    from SICE_products_availability import get_folder_date
+
+    raster, features, features_crs, interpolation = args
+
+    try:
+
+        with rasterio.open(raster) as src:
+
+            coords=transform_features(features, features_crs, src.crs)
+            samples=[]
+
+            points=np.where(features['type']=='point')[0]
+            if len(points):
+                values=sample_points(src, coords['x0'][points], coords['y0'][points],
+                                     interpolation=interpolation)
+                samples.append(pd.DataFrame({'id': features['id'].values[points],
+                                             'type': 'point', 'sample': 0,
+                                             'distance': 0.,
+                                             'x': coords['x0'][points],
+                                             'y': coords['y0'][points],
+                                             'value': values}))
+
+            for i in np.where(features['type']=='profile')[0]:
+                x0, y0, x1, y1 = [coords[column][i] for column in ['x0', 'y0', 'x1', 'y1']]
+                distances, zi = extract_profile(src, x0, y0, x1, y1,
+                                                interpolation=interpolation)
+                fraction=distances/distances[-1] if distances[-1]>0 else np.zeros(len(distances))
+                samples.append(pd.DataFrame({'id': features['id'].values[i],
+                                             'type': 'profile',
+                                             'sample': np.arange(len(zi)),
+                                             'distance': distances,
+                                             'x': x0+(x1-x0)*fraction,
+                                             'y': y0+(y1-y0)*fraction,
+                                             'value': zi}))
+
+    except Exception as e:
+        print('ERROR: %s failed: %s' %(raster, e))
+        return None
+
+    if not samples:
+        return None
+
+    samples=pd.concat(samples, ignore_index=True)
+    samples.insert(0, 'raster', raster)
+    samples.insert(1, 'date', get_folder_date(os.path.basename(os.path.dirname(
+        os.path.abspath(raster)))))
+
+    return samples
+
+
+
+def extract_profiles(features_file=features_file, rasters=rasters,
+                     features_crs=features_crs, interpolation=interpolation,
+                     nb_cores=nb_cores, output_file=output_file, verbose=verbose):
+    '''
+    Runs the extraction of all the features for each raster on a pool of
+    processes, and gathers the samples in a single table.
+
+    INPUTS:
+        features_file: path of the .csv file listing lines and points [string]
+        rasters: paths of the rasters, or path of a .txt file listing them
+                 one per line [list,string]
+        features_crs: CRS of the feature coordinates, set to None if the
+                      features are given in the CRS of the rasters
+                      [string,NoneType]
+        interpolation: 'nearest' or 'bilinear' [string]
+        nb_cores: number of rasters processed at the same time [int]
+        output_file: path of the output .csv file, set to None to only
+                     return the table [string,NoneType]
+        verbose: set to True to print details about processing [boolean]
+
+    OUTPUTS:
+        {output_file}: samples of all the features in all the rasters [.csv]
+        samples: samples of all the features in all the rasters
+                 [pandas.DataFrame]
+
+    '''
+
+    if isinstance(rasters, str):
+        with open(rasters) as f:
+            rasters=[line.strip() for line in f if line.strip()]
+
+    features=read_features(features_file)
+
+    tasks=[(raster, features, features_crs, interpolation) for raster in rasters]
+
+    samples=[]
+
+    with Pool(max(1, min(nb_cores, len(tasks)))) as p:
+        for k, raster_samples in enumerate(p.imap(raster_processing, tasks)):
+            if raster_samples is not None:
+                samples.append(raster_samples)
+            if verbose:
+                print(k+1, '/', len(tasks))
+
+    samples=pd.concat(samples, ignore_index=True) if samples else pd.DataFrame()
+
+    if output_file is not None:
+        samples.to_csv(output_file, index=False)
+
+    return samples
+
+
+
+if __name__=='__main__':
+
+    parser = argparse.ArgumentParser(description='Extract raster values along '
+                                     'lines and at points from many rasters')
+    parser.add_argument('--features', default=features_file,
+                        help='.csv file with the columns id, x0, y0, x1, y1')
+    parser.add_argument('--rasters', nargs='+', default=[rasters],
+                        help='rasters, or a .txt file listing them')
+    parser.add_argument('--features_crs', default=features_crs,
+                        help='CRS of the features, "none" for the CRS of the rasters')
+    parser.add_argument('--interpolation', default=interpolation,
+                        choices=['nearest', 'bilinear'])
+    parser.add_argument('--nb_cores', type=int, default=nb_cores)
+    parser.add_argument('--output', default=output_file)
+    parser.add_argument('--quiet', action='store_true')
+    args = parser.parse_args()
+
+    if time_it:
+        start_time = time.time()
+
+    rasters_list=args.rasters
+    if len(rasters_list)==1 and rasters_list[0].endswith('.txt'):
+        rasters_list=rasters_list[0]
+
+    extract_profiles(features_file=args.features, rasters=rasters_list,
+                     features_crs=None if args.features_crs.lower()=='none'
+                     else args.features_crs,
+                     interpolation=args.interpolation, nb_cores=args.nb_cores,
+                     output_file=args.output, verbose=not args.quiet)
+
+    if time_it:
+        end_time = time.time()
+        processing_time=(end_time - start_time)/60
+        if not args.quiet:
+            print('--- Processing time: %.3f minutes ---' %processing_time)
@@ -23,6 +23,9 @@ INPUTS:
     slope_thres: slope threshold in degrees to create slope_flag. Default 
                      is set to 15° based on the "small slope approximation" 
                      (Picard et al, 2020) [int]
+    cast_shadow: set to True to flag pixels in cast shadow using the horizon 
+                 angles precomputed by get_horizon_angles.py. Skipped if
+                 {region}_arcticdem_horizon.tif is missing in inpath_adem [boolean]
     outpath: path where to save {var}_eff.tif [string]
     
     WARNING: SZA.tif, OZA.tif, SAA.tif and rBRR_{band_num}.tif are needed 
@@ -40,6 +43,9 @@ OUTPUTS:
         OZA_eff.tif: tiff file containing the viewing solar zenith angle [.tif]
         IBOAR_{band_num}.tif: tiff file containing the effective angles for each
                               band_num [.tif] 
+        if cast_shadow set to True:
+            horizon.tif: tiff file containing the horizon angles [.tif]
+            cast_shadow_flag.tif: tiff file containing cast_shadow_flag [.tif]
         
 """
 
@@ -49,7 +55,7 @@ import rasterio
 import glob
 import os
 import argparse
-from osgeo import gdal, gdalconst
+from sice_cog import write_cog
 import time
 
 
@@ -77,13 +83,15 @@ if not run_command_line:
     inpath_adem='/srv/home/8675309/AW/'
     region='Greenland'
     slope_thres=15
+    cast_shadow=True
     outpath='/srv/home/8675309/AW/'
     
 
 
 
 def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=region,
-                         slope_thres=slope_thres,outpath=outpath,verbose=verbose):
+                         slope_thres=slope_thres,cast_shadow=cast_shadow,
+                         outpath=outpath,verbose=verbose):
     
     '''
     
@@ -99,6 +107,8 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
                      is set to 15° based on the "small slope approximation" 
                      (Picard et al, 2020). 1 for slope<=slope_thres, 
                      255 (no data) for slope>slope_thres [int]
+        cast_shadow: set to True to resample the horizon angles precomputed
+                     by get_horizon_angles.py [boolean]
         outpath: path where to save {var}_eff.tif [string]
     
     OUTPUTS:
@@ -111,6 +121,8 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
             slope.tif: tiff file containing the slope [.tif]
             slope_flag.tif: tiff file containing the slope_flag [.tif] 
             aspect.tif: tiff file containing the slope aspect [.tif]
+            if cast_shadow set to True:
+                horizon.tif: tiff file containing the horizon angles [.tif]
         
     '''
     
@@ -134,11 +146,11 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
     def resample_clip_adem(var,inpath=inpath,inpath_adem=inpath_adem,outpath=outpath,reg=region):
         '''
         
-        Resamples and clips ArcticDEM derived slopes and aspects to match S3Snow
-        outputs.
+        Resamples and clips ArcticDEM derived slopes, aspects and horizon angles
+        to match S3Snow outputs.
         
         INPUTS:
-            var: name of the variable to compute ("slope" or "aspect") [string]
+            var: name of the variable to compute ("slope", "aspect" or "horizon") [string]
             inpath: path to the folder containing the variables (var, height and saa needed) [string]
             inpath_adem: path to the folder containing regional ArcticDEM derived 
                          slopes and aspects [string]
@@ -147,43 +159,66 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
         OUTPUTS: 
             if var is set to slope: 
                 {outpath}/slope.tif: Resampled and clipped ArcticDEM derived slopes [.tif]
-            if var is set to slope: 
+            if var is set to aspect: 
                 {outpath}/aspect.tif: Resampled and clipped ArcticDEM derived aspects [.tif]
+            if var is set to horizon: 
+                {outpath}/horizon.tif: Resampled and clipped horizon angles [.tif]
         
         '''
             
+        from rasterio.warp import reproject, Resampling
+        
         #source
         src_filename = inpath_adem+reg+'_arcticdem_'+var+'.tif'
-        src = gdal.Open(src_filename, gdalconst.GA_ReadOnly)
-        src_proj = src.GetProjection()
-        src_geotrans = src.GetGeoTransform()
+        src = rasterio.open(src_filename)
         
         #raster to match
         match_filename = inpath+angle_name
-        match_ds = gdal.Open(match_filename, gdalconst.GA_ReadOnly)
-        match_proj = match_ds.GetProjection()
-        match_geotrans = match_ds.GetGeoTransform()
-        wide = match_ds.RasterXSize
-        high = match_ds.RasterYSize
+        match_ds = rasterio.open(match_filename)
         
-        #output/destination
-        dst_filename = inpath+var+'.tif'
-        dst = gdal.GetDriverByName('Gtiff').Create(dst_filename, wide, high, 1, gdalconst.GDT_Float32)
-        dst.SetGeoTransform( match_geotrans )
-        dst.SetProjection( match_proj)
+        #output/destination, 0 outside the source and where it has no data
+        dst_nodata = None if src.nodata is None else np.nan
+        dst_data = np.full((src.count, match_ds.height, match_ds.width), 
+                           0 if dst_nodata is None else np.nan, dtype=np.float32)
         
         #run
-        gdal.ReprojectImage(src, dst, src_proj, match_proj, gdalconst.GRA_NearestNeighbour)
+        reproject(source=src.read().astype(np.float32), destination=dst_data,
+                  src_transform=src.transform, src_crs=src.crs, src_nodata=src.nodata,
+                  dst_transform=match_ds.transform, dst_crs=match_ds.crs, 
+                  dst_nodata=dst_nodata, resampling=Resampling.nearest)
+        if dst_nodata is not None:
+            dst_data[np.isnan(dst_data)] = 0
+        
+        profile = match_ds.profile
+        profile.update(nodata=None)
+        
+        #keeping sector azimuths of horizon angles
+        write_cog(inpath+var+'.tif', dst_data, profile, 
+                  resampling='nearest' if var=='aspect' else 'average',
+                  band_tags=[src.tags(b) for b in range(1,src.count+1)])
+        
+        src.close()
+        match_ds.close()
         
     
     #running resample_clip_adem()
     resample_clip_adem(var='slope')
     resample_clip_adem(var='aspect')
     
+    #horizon angles only needed once, with slope and aspect
+    if var=='SZA' and cast_shadow:
+        if os.path.isfile(inpath_adem+region+'_arcticdem_horizon.tif'):
+            resample_clip_adem(var='horizon')
+        elif verbose:
+            print('WARNING: %s_arcticdem_horizon.tif is missing, cast shadows ignored' %region)
+    
     #loading slope and aspect
     slope=rasterio.open(inpath+'slope.tif').read(1)
     aspect=rasterio.open(inpath+'aspect.tif').read(1)
     
+    #flat pixels have an aspect of 0, consistently with get_slope_aspect.py
+    aspect[slope==0]=0
+    
     
     #creating a flag based on the "small slope approximation" 
     slope_flag=slope.copy()
@@ -210,14 +245,12 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
     
     #writing the output
     output_filename=outpath+var+'_eff'+'.tif'
-    with rasterio.open(output_filename, 'w', **profile) as dst:
-        dst.write(angle_eff, 1)
+    write_cog(output_filename, angle_eff, profile, resampling='average')
     
     #writing slope_flag 
     profile.update(nodata=255)
     slope_flag_filename=outpath+'slope_flag_'+str(slope_thres)+'_degrees.tif'
-    with rasterio.open(slope_flag_filename, 'w', **profile) as dst:
-        dst.write(slope_flag, 1)   
+    write_cog(slope_flag_filename, slope_flag, profile)
     
     #returning slope, aspect and slope flag only for SZA (only once)
     if var=='SZA':
@@ -230,8 +263,48 @@ def get_effective_angles(var=var,inpath=inpath,inpath_adem=inpath_adem,region=re
 
 
 
+def get_cast_shadow_flag(sza,saa,horizon,azimuths):
+    '''
+    
+    Flags pixels in cast shadow by interpolating the horizon angles precomputed
+    by get_horizon_angles.py at the solar azimuth angle, and comparing them with
+    the solar elevation angle.
+    
+    INPUTS:
+        sza: solar zenith angle (flat) [array]
+        saa: solar azimuth angle (flat) [array]
+        horizon: horizon angles, one layer per azimuth sector [array]
+        azimuths: sector azimuths in degrees, evenly spaced from 0° [array]
+    
+    OUTPUTS:
+        cast_shadow_flag: cast shadow mask. 1 for illuminated pixels, 255 (no data)
+                          for pixels in cast shadow [array]
+    
+    '''
+    
+    #position of saa between the two closest sectors
+    sector_width=360/len(azimuths)
+    position=np.mod(np.nan_to_num(saa),360)/sector_width
+    lower=np.floor(position).astype(int)%len(azimuths)
+    upper=(lower+1)%len(azimuths)
+    weight=position-np.floor(position)
+    
+    #linear interpolation of the horizon angle at saa
+    horizon_lower=np.take_along_axis(horizon,lower[np.newaxis],axis=0)[0]
+    horizon_upper=np.take_along_axis(horizon,upper[np.newaxis],axis=0)[0]
+    horizon_saa=(1-weight)*horizon_lower+weight*horizon_upper
+    
+    cast_shadow_flag=np.ones(np.shape(sza),dtype=np.uint8)
+    cast_shadow_flag[90-sza<horizon_saa]=255
+    
+    return cast_shadow_flag
+
+
+
+
 
-def get_IBOAR(slope,aspect,slope_flag,inpath=inpath,outpath=outpath,verbose=verbose):
+def get_IBOAR(slope,aspect,slope_flag,inpath=inpath,outpath=outpath,
+              cast_shadow=cast_shadow,verbose=verbose):
     '''
     
     Determines the Intrinsic Bottom of Atmosphere Reflectance (IBOAR) for given bands 
@@ -244,11 +317,17 @@ def get_IBOAR(slope,aspect,slope_flag,inpath=inpath,outpath=outpath,verbose=verb
                     1 for slope<=threshold, 255 (no data) for slope>threshold [array]
         inpath: path to the folder containing the variables (rBRR and SAA needed) [string]
         outpath: path where to save R_slope_{band}.tif [string]
+        cast_shadow: set to True to mask pixels in cast shadow using horizon.tif
+                     resampled by get_effective_angles() [boolean]
         verbose: set to True to print details about processing [boolean]
     
     OUTPUTS:
         IBOAR_{band_num}.tif: tiff file containing the effective angles for each
                               band_num [.tif] 
+        if cast_shadow set to True:
+            cast_shadow_flag.tif: tiff file containing the cast shadow mask. 1 for
+                                  illuminated pixels, 255 (no data) for pixels 
+                                  in cast shadow [.tif]
                               
     '''
     
@@ -268,6 +347,19 @@ def get_IBOAR(slope,aspect,slope_flag,inpath=inpath,outpath=outpath,verbose=verb
     profile=saa_io.profile #saving profile as base for IBOAR file
     saa=saa_io.read(1)
     
+    #flagging cast shadows from the precomputed horizon angles
+    cast_shadow_flag=None
+    if cast_shadow and os.path.isfile(inpath+'horizon.tif'):
+        horizon_io=rasterio.open(inpath+'horizon.tif')
+        horizon=horizon_io.read()
+        azimuths=np.array([float(horizon_io.tags(b)['azimuth']) 
+                           for b in range(1,horizon_io.count+1)])
+        cast_shadow_flag=get_cast_shadow_flag(sza,saa,horizon,azimuths)
+        
+        profile_flag=profile.copy()
+        profile_flag.update(dtype=rasterio.uint8,nodata=255)
+        write_cog(outpath+'cast_shadow_flag.tif', cast_shadow_flag, profile_flag)
+    
     
     #computing IBOAR for each available band
     for i,brr in enumerate(BRRs_paths):
@@ -286,13 +378,16 @@ def get_IBOAR(slope,aspect,slope_flag,inpath=inpath,outpath=outpath,verbose=verb
         #masking iboar with slope_flag
         iboar[slope_flag==255]=255
         
+        #masking iboar with cast_shadow_flag
+        if cast_shadow_flag is not None:
+            iboar[cast_shadow_flag==255]=255
+        
         #saving band number
         band_num=BRRs_paths[i].split(os.sep)[-1].split('.')[0][-2:]
         
         #writing IBOAR_{band_num} in a tif
         profile.update(nodata=255)
-        with rasterio.open(outpath+'IBOAR_'+band_num+'.tif', 'w', **profile) as dst:
-            dst.write(iboar, 1)
+        write_cog(outpath+'IBOAR_'+band_num+'.tif', iboar, profile, resampling='average')
  
 
 
@@ -8,8 +8,14 @@ rasters over a given specific area.
 The default variables are the Snow Grain Diameter (SGD) and the percentage 
 of variations between the Bottom Of Atmosphere Reflectance (BOAR) and the 
 Intrinsic Bottom Of Atmosphere Reflectance (IBOAR). 
-The function is run by multiprocessing to drastically decrease computation 
-time.
+The windowed sums needed by the linear regression (n, Σx, Σy, Σxy, Σx², Σy²) 
+are computed for the whole grid at once using summed-area tables (integral 
+images), which drastically decreases computation time.
+For grids too large to fit in memory, the tiled mode reads overlapping windows
+(tile + half the specific area as halo) and runs the tiles by multiprocessing.
+The temporal mode computes, for every pixel, the linear regression between two 
+variables through time, streaming the dates into running sums so that only one 
+date is held in memory at a time.
 This example can be easily modified with other variables and function to 
 apply.
 
@@ -18,11 +24,37 @@ INPUTS:
     outpath: path to the folder to store the output [string]
     output_name: name of the output that will be stored in a .tif file [string]
     resolution: side length of the specific area in pixels. [int]
+    min_valid: minimum number of valid pixel pairs in the specific area to 
+               compute the correlation [int]
+    full_statistics: set to True to store all the outputs of the linear 
+                     regression instead of the correlation coefficient only [boolean]
+    resolutions: side lengths of the specific areas in pixels to run several 
+                 scales at once from the same summed-area tables. Set to None 
+                 to only run resolution [list,NoneType]
+    tiled: set to True to process the rasters tile by tile [boolean]
+    tile_size: side length of the tiles in pixels, multiple of 16 [int]
+    nb_cores: number of cores used to process the tiles [int]
+    temporal: set to True to run the temporal mode instead [boolean]
+    inpath: path to the folder containing SICE date folders, for the temporal 
+            mode [string]
+    temporal_variables: names of the two variables to analyse through time, 
+                        for the temporal mode [list]
+    start_date, end_date: dates (YYYY-MM-DD) delimiting the temporal mode, 
+                          set to None to use all the dates [string,NoneType]
                      
     
 OUTPUTS:
     {outpath}{output_name}.tif: outputs stored in a .tif file. It has the same 
                                 metadata as the inputs [.tif]
+                                if full_statistics is set to True, bands are
+                                slope, intercept, rvalue, pvalue, stderr and
+                                number of valid pixel pairs.
+    if resolutions is set:
+        {outpath}{output_name}_{resolution}px.tif: outputs for each resolution,
+                                                   same content as above [.tif]
+    if temporal is set to True:
+        {outpath}{output_name}_temporal.tif: outputs of the linear regression 
+                                             through time [.tif]
     if the variables have different dimensions:
         {var}_resampled.tif: Downsampling of the variable with the highest 
                              resolution [.tif]
@@ -33,27 +65,50 @@ OUTPUTS:
 
 import numpy as np
 import rasterio
-import scipy
+from rasterio.windows import Window
 from scipy import stats
-#from tqdm import tqdm
+import time
+import glob
+import os
 import multiprocessing
 from multiprocessing import Pool
-import time
-from osgeo import gdal, gdalconst
+from sice_cog import write_cog, add_overviews
 
 SGD='/srv/home/8675309/AW/B_corr/albedo_bb_planar_sw.tif'
 B='/srv/home/8675309/AW/B_corr/diff_iobar_boar.tif'
 outpath='/srv/home/8675309/AW/B_corr/'
 output_name='correlations_bba'
+full_statistics=True
+resolutions=None
+tiled=False
+tile_size=1024
+nb_cores=multiprocessing.cpu_count()
+
+temporal=False
+inpath='/srv/home/8675309/SICE/'
+temporal_variables=['albedo_bb_planar_sw', 'grain_diameter']
+start_date=None
+end_date=None
 
 
 
 class SGD_B_correlation():
     
-    def __init__(self, SGD=SGD, B=B, resolution=4):
-        self.res=resolution/2
+    statistics=['slope', 'intercept', 'rvalue', 'pvalue', 'stderr', 'n']
+    
+    #variances below this fraction of the squared magnitude of a variable are
+    #rounding leftovers of the sums, i.e. a constant variable
+    variance_tolerance=1e-10
+    
+    #rounding errors of windowed sums taken from summed-area tables grow with 
+    #the sums over the whole grid, bounded by this factor times eps
+    rounding_factor=8
+    
+    def __init__(self, SGD=SGD, B=B, resolution=4, min_valid=3):
+        self.res=int(resolution/2)
         self.SGD=SGD
         self.B=B
+        self.min_valid=min_valid
         
 
     def get_variables_names(self):
@@ -67,104 +122,611 @@ class SGD_B_correlation():
         return rSGD,rB
     
     def variables_dimensions(self):
-        SGD_dims=np.shape(SGD)
-        B_dims=np.shape(B)
+        SGD_dims=rasterio.open(self.SGD).shape
+        B_dims=rasterio.open(self.B).shape
         return SGD_dims, B_dims
         
     
-    def get_combinations(self):
-        mesh = np.array(np.meshgrid(np.arange(0,B.shape[0]),np.arange(0,B.shape[1])))
-        combinations = mesh.T.reshape(-1, 2)
+    def integral_images(self, rSGD, rB):
+        '''
+        
+        Computes the summed-area tables of the valid pixel count and of the 
+        sufficient statistics of the linear regression. Only pixels where both 
+        variables are finite are used. Variables are centered on their means 
+        to limit the loss of precision of the cumulative sums.
+        
+        INPUTS:
+            rSGD, rB: variables to analyse [arrays]
+            
+        OUTPUTS:
+            integrals: summed-area tables of n, x, y, xy, x² and y², padded 
+                       with a leading row and column of zeros [array]
+            means: means used to center the variables [tuple]
+        
+        '''
         
-        return combinations
+        valid=np.isfinite(rSGD) & np.isfinite(rB)
+        
+        if np.any(valid):
+            means=(np.mean(rSGD[valid]), np.mean(rB[valid]))
+        else:
+            means=(0, 0)
+        x=np.where(valid, rSGD-means[0], 0).astype(np.float64)
+        y=np.where(valid, rB-means[1], 0).astype(np.float64)
+        
+        integrals=np.zeros((6, x.shape[0]+1, x.shape[1]+1))
+        for i, stat in enumerate([valid, x, y, x*y, x**2, y**2]):
+            integrals[i, 1:, 1:]=np.cumsum(np.cumsum(stat, axis=0), axis=1)
+            
+        return integrals, means
     
-    def correlation(self,k):
-        if k%1E8==0:
-            print(k,'/',len(combinations))
-        posx=combinations[k][0]
-        posy=combinations[k][1]
+    def window_sums(self, integrals, resolution=None):
+        '''
+        
+        Computes the sums over the specific area around each pixel from the 
+        summed-area tables, i.e. four lookups per pixel whatever the area size.
+        The specific area is clipped at the edges of the grid.
         
-        clipped_SGD=SGD[posx-self.res:posx+self.res,posy-self.res:posy+self.res]
-        clipped_B=B[posx-self.res:posx+self.res,posy-self.res:posy+self.res]
+        INPUTS:
+            integrals: summed-area tables computed by integral_images() [array]
+            resolution: side length of the specific area in pixels, set to 
+                        None to use the resolution of the instance [int,NoneType]
+            
+        OUTPUTS:
+            sums: windowed n, Σx, Σy, Σxy, Σx² and Σy² [array]
+        
+        '''
         
-        if np.sum(clipped_SGD)==0 or np.sum(clipped_B)==0:
-            rvalue=np.nan
+        if resolution is None:
+            res=self.res
         else:
-            results=scipy.stats.linregress(clipped_SGD.flatten(),clipped_B.flatten())
-            rvalue=results.rvalue
+            res=int(resolution/2)
+        
+        height, width = integrals.shape[1]-1, integrals.shape[2]-1
+        
+        rows=np.arange(height)
+        cols=np.arange(width)
+        r0=np.clip(rows-res, 0, height)[:, np.newaxis]
+        r1=np.clip(rows+res, 0, height)[:, np.newaxis]
+        c0=np.clip(cols-res, 0, width)[np.newaxis, :]
+        c1=np.clip(cols+res, 0, width)[np.newaxis, :]
+        
+        sums=integrals[:, r1, c1]-integrals[:, r0, c1]-integrals[:, r1, c0]\
+            +integrals[:, r0, c0]
         
-        return rvalue
+        return sums
     
-   
-c=SGD_B_correlation()
-SGD, B=c.load_variables()
-SGD_dims, B_dims=c.variables_dimensions()
-SGD_path, B_path=c.get_variables_names()
-
-
-if SGD_dims!=B_dims:
-    print('The variables have different dimensions... Downsampling the highest resolution...')
-    variables = {np.prod(SGD_dims):SGD_path, np.prod(B_dims):B_path}
+    def correlation(self, rSGD, rB):
+        '''
+        
+        Computes the correlation coefficient (r-value of the linear regression) 
+        between the two variables over the specific area around each pixel.
+        
+        INPUTS:
+            rSGD, rB: variables to analyse [arrays]
+            
+        OUTPUTS:
+            rvalues: correlation coefficients, NaN where less than min_valid 
+                     valid pixel pairs or a constant variable [array]
+        
+        '''
+        
+        integrals, means = self.integral_images(rSGD, rB)
+        
+        return self.rvalues_from_sums(self.window_sums(integrals), 
+                                      self.rounding_errors(integrals))
+    
+    def rounding_errors(self, integrals):
+        '''
+        
+        INPUTS:
+            integrals: summed-area tables computed by integral_images() [array]
+            
+        OUTPUTS:
+            errors: bounds of the rounding errors of the windowed Σx² and Σy² 
+                    taken from the summed-area tables [tuple]
+        
+        '''
+        
+        eps=np.finfo(np.float64).eps
+        
+        return (self.rounding_factor*eps*integrals[4, -1, -1], 
+                self.rounding_factor*eps*integrals[5, -1, -1])
+    
+    def zero_variance(self, n, s, ss, error=0):
+        '''
+        
+        Flags the specific areas where a variable is constant. The sum of 
+        squared deviations computed from the sums is not exactly zero there, 
+        so it is compared to the squared magnitude of the variable and to the 
+        rounding error of the sums.
+        
+        INPUTS:
+            n: windowed number of valid pixel pairs [array]
+            s, ss: windowed Σ and Σ² of the variable [arrays]
+            error: rounding error of ss, see rounding_errors() [float]
+            
+        OUTPUTS:
+            constant: True where the variable is constant or where there is no
+                      valid pixel pair [array]
+        
+        '''
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sm=s**2/n
+            constant=~(ss-sm>np.maximum(self.variance_tolerance*np.maximum(ss, sm), 
+                                        error))
+            
+        return constant
     
-    #source
-    src_filename = variables.get(max(variables))
-    src = gdal.Open(src_filename, gdalconst.GA_ReadOnly)
-    src_proj = src.GetProjection()
-    src_geotrans = src.GetGeoTransform()
+    def rvalues_from_sums(self, sums, errors=(0, 0)):
+        '''
+        
+        INPUTS:
+            sums: windowed sums computed by window_sums() [array]
+            errors: rounding errors of the windowed Σx² and Σy², see 
+                    rounding_errors() [tuple]
+            
+        OUTPUTS:
+            rvalues: correlation coefficients, NaN where less than min_valid 
+                     valid pixel pairs or a constant variable [array]
+        
+        '''
+        
+        n, sx, sy, sxy, sxx, syy = sums
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rvalues=(n*sxy-sx*sy)/np.sqrt((n*sxx-sx**2)*(n*syy-sy**2))
+            
+        constant=self.zero_variance(n, sx, sxx, errors[0]) \
+            | self.zero_variance(n, sy, syy, errors[1])
+        rvalues[(n<self.min_valid) | constant]=np.nan
+        rvalues=np.clip(rvalues, -1, 1)
+        
+        return rvalues
     
-    #raster to match
-    match_filename = variables.get(min(variables))
-    match_ds = gdal.Open(match_filename, gdalconst.GA_ReadOnly)
-    match_proj = match_ds.GetProjection()
-    match_geotrans = match_ds.GetGeoTransform()
-    wide = match_ds.RasterXSize
-    high = match_ds.RasterYSize
+    def regression(self, rSGD, rB):
+        '''
+        
+        Computes all the outputs of the linear regression between the two 
+        variables over the specific area around each pixel, from the same
+        windowed sums as correlation(). Formulas follow scipy.stats.linregress.
+        
+        INPUTS:
+            rSGD, rB: variables to analyse [arrays]
+            
+        OUTPUTS:
+            results: slope, intercept, rvalue, pvalue, stderr and number of 
+                     valid pixel pairs stacked in this order (see statistics), 
+                     NaN where less than min_valid valid pixel pairs [array]
+        
+        '''
+        
+        integrals, means = self.integral_images(rSGD, rB)
+        
+        return self.statistics_from_sums(self.window_sums(integrals), means, 
+                                         self.rounding_errors(integrals))
     
-    #output/destination
-    to_resample_name=variables.get(max(variables)).split('/')[-1].split('.')[0]
-    dst_filename = outpath+to_resample_name+'_resampled.tif'
-    dst = gdal.GetDriverByName('Gtiff').Create(dst_filename, wide, high, 1, gdalconst.GDT_Float32)
-    dst.SetGeoTransform( match_geotrans )
-    dst.SetProjection( match_proj)
+    def statistics_from_sums(self, sums, means, errors=(0, 0)):
+        '''
+        
+        INPUTS:
+            sums: windowed sums computed by window_sums() [array]
+            means: means used to center the variables in integral_images() [tuple]
+            errors: rounding errors of the windowed Σx² and Σy², see 
+                    rounding_errors() [tuple]
+            
+        OUTPUTS:
+            results: slope, intercept, rvalue, pvalue, stderr and number of 
+                     valid pixel pairs stacked in this order (see statistics), 
+                     NaN where less than min_valid valid pixel pairs or a 
+                     constant x. Where y is constant, slope is 0 and rvalue, 
+                     pvalue and stderr are NaN [array]
+        
+        '''
+        
+        n, sx, sy, sxy, sxx, syy = sums
+        
+        constant_x=self.zero_variance(n, sx, sxx, errors[0])
+        constant_y=self.zero_variance(n, sy, syy, errors[1])
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            
+            #(co)variances of the specific areas, rounding leftovers removed 
+            #where a variable is constant
+            xmean=sx/n
+            ymean=sy/n
+            ssxm=np.where(constant_x, np.nan, sxx/n-xmean**2)
+            ssym=np.where(constant_y, np.nan, syy/n-ymean**2)
+            ssxym=np.where(constant_y, 0, sxy/n-xmean*ymean)
+            
+            rvalue=np.clip(ssxym/np.sqrt(ssxm*ssym), -1, 1)
+            slope=ssxym/ssxm
+            intercept=(ymean+means[1])-slope*(xmean+means[0])
+            
+            #two-sided p-value of the t-test with n-2 degrees of freedom
+            df=n-2
+            TINY=1.0e-20
+            t=rvalue*np.sqrt(df/((1.0-rvalue+TINY)*(1.0+rvalue+TINY)))
+            pvalue=2*stats.t.sf(np.abs(t), df)
+            
+            stderr=np.sqrt((1-rvalue**2)*ssym/ssxm/df)
+        
+        results=np.stack([slope, intercept, rvalue, pvalue, stderr, n])
+        results[:5, n<self.min_valid]=np.nan
+        
+        return results
+    
+    def multiscale(self, rSGD, rB, resolutions, full_statistics=True):
+        '''
+        
+        Runs the correlation or the linear regression for several sizes of the 
+        specific area. The summed-area tables are only computed once, so that 
+        each additional scale only costs the window lookups.
+        
+        INPUTS:
+            rSGD, rB: variables to analyse [arrays]
+            resolutions: side lengths of the specific areas in pixels [list]
+            full_statistics: set to True to compute all the outputs of the 
+                             linear regression, rvalue only otherwise [boolean]
+            
+        OUTPUTS:
+            results: outputs of regression() or correlation() for each 
+                     resolution [dictionary]
+        
+        '''
+        
+        integrals, means = self.integral_images(rSGD, rB)
+        errors=self.rounding_errors(integrals)
+        
+        results={}
+        for resolution in resolutions:
+            sums=self.window_sums(integrals, resolution=resolution)
+            if full_statistics:
+                results[resolution]=self.statistics_from_sums(sums, means, errors)
+            else:
+                results[resolution]=self.rvalues_from_sums(sums, errors)[np.newaxis]
+                
+        return results
     
-    #run
-    gdal.ReprojectImage(src, dst, src_proj, match_proj, gdalconst.GRA_NearestNeighbour)
-    del dst # Flush
+    def get_tiles(self, tile_size=1024):
+        '''
+        
+        INPUTS:
+            tile_size: side length of the tiles in pixels [int]
+            
+        OUTPUTS:
+            tiles: windows covering the grid of the variables [list]
+        
+        '''
+        
+        height, width = rasterio.open(self.SGD).shape
+        
+        tiles=[Window(col, row, min(tile_size, width-col), min(tile_size, height-row))
+               for row in range(0, height, tile_size)
+               for col in range(0, width, tile_size)]
+        
+        return tiles
     
-    c.__init__(SGD=variables.get(min(variables)), B=dst_filename)
-    SGD, B=c.load_variables()
+    def tile_processing(self, args):
+        '''
+        
+        Runs multiscale() on a tile extended by a halo of half the largest 
+        specific area, so that the results of the tile are identical to the 
+        ones of the whole grid.
+        
+        INPUTS:
+            args: tile window, resolutions and full_statistics (see 
+                  multiscale()) [tuple]
+            
+        OUTPUTS:
+            tile: tile window [rasterio.windows.Window]
+            results: outputs of multiscale() cropped to the tile [dictionary]
+        
+        '''
+        
+        tile, resolutions, full_statistics = args
+        
+        with rasterio.open(self.SGD) as src_SGD, rasterio.open(self.B) as src_B:
+            
+            height, width = src_SGD.shape
+            
+            #tile extended by the halo, clipped to the grid
+            halo=max([int(resolution/2) for resolution in resolutions])
+            row0=max(0, tile.row_off-halo)
+            row1=min(height, tile.row_off+tile.height+halo)
+            col0=max(0, tile.col_off-halo)
+            col1=min(width, tile.col_off+tile.width+halo)
+            extended=Window.from_slices((row0, row1), (col0, col1))
+            
+            rSGD=src_SGD.read(1, window=extended).astype(np.float64)
+            rB=src_B.read(1, window=extended).astype(np.float64)
+            
+        rB[np.isnan(rSGD)]=np.nan
+        
+        results=self.multiscale(rSGD, rB, resolutions, full_statistics)
+        
+        #removing the halo
+        rows=slice(tile.row_off-row0, tile.row_off-row0+tile.height)
+        cols=slice(tile.col_off-col0, tile.col_off-col0+tile.width)
+        results={resolution: res[:, rows, cols] for resolution, res in results.items()}
+            
+        return tile, results
     
+    def tiled(self, output_filenames, full_statistics=True, tile_size=1024,
+              nb_cores=multiprocessing.cpu_count()):
+        '''
+        
+        Runs the correlation or the linear regression tile by tile, by 
+        multiprocessing over the tiles. Only the tiles being processed are held 
+        in memory and results are written in tiled .tif files.
+        
+        INPUTS:
+            output_filenames: path of the output .tif file for each resolution
+                              [dictionary]
+            full_statistics: set to True to compute all the outputs of the 
+                             linear regression, rvalue only otherwise [boolean]
+            tile_size: side length of the tiles in pixels, multiple of 16 [int]
+            nb_cores: number of cores used to process the tiles [int]
+            
+        OUTPUTS:
+            {output_filename}.tif: outputs of regression() or correlation() for 
+                                   each resolution [.tif]
+        
+        '''
+        
+        profile=rasterio.open(self.SGD).profile
+        profile.update(dtype=rasterio.float64, 
+                       count=len(self.statistics) if full_statistics else 1,
+                       tiled=True, blockxsize=tile_size, blockysize=tile_size,
+                       compress='deflate')
+        
+        resolutions=list(output_filenames.keys())
+        tasks=[(tile, resolutions, full_statistics) for tile in self.get_tiles(tile_size)]
+        
+        dsts={resolution: rasterio.open(output_filename, 'w', **profile) 
+              for resolution, output_filename in output_filenames.items()}
+        
+        try:
+            with Pool(nb_cores) as p:
+                for k, (tile, results) in enumerate(p.imap_unordered(self.tile_processing, 
+                                                                     tasks)):
+                    for resolution, res in results.items():
+                        dsts[resolution].write(res, window=tile)
+                    print(k+1, '/', len(tasks))
+                        
+            if full_statistics:
+                for dst in dsts.values():
+                    for i, statistic in enumerate(self.statistics):
+                        dst.set_band_description(i+1, statistic)
+        finally:
+            for dst in dsts.values():
+                dst.close()
+        
+        for output_filename in output_filenames.values():
+            add_overviews(output_filename, resampling='average')
     
 
-B[np.isnan(SGD)]=np.nan
-combinations=c.get_combinations()
 
+class SGD_B_temporal_correlation(SGD_B_correlation):
+    
+    def __init__(self, SGD_files, B_files, min_valid=3):
+        self.SGD_files=SGD_files
+        self.B_files=B_files
+        self.SGD=SGD_files[0]
+        self.B=B_files[0]
+        self.min_valid=min_valid
+        
+    def load_date(self, k):
+        rSGD=rasterio.open(self.SGD_files[k]).read(1).astype(np.float64)
+        rB=rasterio.open(self.B_files[k]).read(1).astype(np.float64)
+        return rSGD,rB
+    
+    def running_sums(self, verbose=True):
+        '''
+        
+        Accumulates the valid pixel count and the sufficient statistics of the 
+        linear regression date by date. Variables are centered on the means of 
+        the first date to limit the loss of precision of the sums.
+        
+        INPUTS:
+            verbose: set to True to print details about processing [boolean]
+            
+        OUTPUTS:
+            sums: per-pixel n, Σx, Σy, Σxy, Σx² and Σy² through time [array]
+            means: means used to center the variables [tuple]
+        
+        '''
+        
+        sums=None
+        
+        for k in range(len(self.SGD_files)):
+            
+            rSGD, rB = self.load_date(k)
+            valid=np.isfinite(rSGD) & np.isfinite(rB)
+            
+            if sums is None:
+                sums=np.zeros((6, rSGD.shape[0], rSGD.shape[1]))
+                if np.any(valid):
+                    means=(np.mean(rSGD[valid]), np.mean(rB[valid]))
+                else:
+                    means=(0, 0)
+                
+            x=np.where(valid, rSGD-means[0], 0)
+            y=np.where(valid, rB-means[1], 0)
+            
+            for i, stat in enumerate([valid, x, y, x*y, x**2, y**2]):
+                sums[i]+=stat
+                
+            if verbose:
+                print(k+1, '/', len(self.SGD_files))
+                
+        return sums, means
+    
+    def regression(self, verbose=True):
+        '''
+        
+        INPUTS:
+            verbose: set to True to print details about processing [boolean]
+            
+        OUTPUTS:
+            results: per-pixel slope, intercept, rvalue, pvalue, stderr and 
+                     number of valid dates stacked in this order (see 
+                     statistics), NaN where less than min_valid valid dates 
+                     or constant through time, as in statistics_from_sums() 
+                     [array]
+        
+        '''
+        
+        sums, means = self.running_sums(verbose=verbose)
+        
+        return self.statistics_from_sums(sums, means)
+    
+    def correlation(self, verbose=True):
+        '''
+        
+        INPUTS:
+            verbose: set to True to print details about processing [boolean]
+            
+        OUTPUTS:
+            rvalues: per-pixel correlation coefficients through time, NaN where 
+                     less than min_valid valid dates or a variable constant 
+                     through time (e.g. saturated or fill values) [array]
+        
+        '''
+        
+        sums, means = self.running_sums(verbose=verbose)
+        
+        return self.rvalues_from_sums(sums)
+    
 
 
-nb_cores=multiprocessing.cpu_count()
-start_time = time.time()
-   
-if __name__ == '__main__':
-    rvalues=np.zeros((SGD.shape[0],SGD.shape[1]))
-    op=0
+def get_date_files(inpath, temporal_variables, start_date=None, end_date=None):
+    '''
+    
+    Lists the SICE date folders (YYYY-MM-DD) where both variables are available.
+    
+    INPUTS:
+        inpath: path to the folder containing SICE date folders [string]
+        temporal_variables: names of the two variables to analyse [list]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to 
+                              None to use all the dates [string,NoneType]
+        
+    OUTPUTS:
+        SGD_files, B_files: paths of the two variables for the common dates [lists]
+    
+    '''
+    
+    dates=sorted(d for d in os.listdir(inpath) 
+                 if os.path.isfile(inpath+d+os.sep+temporal_variables[0]+'.tif')
+                 and os.path.isfile(inpath+d+os.sep+temporal_variables[1]+'.tif'))
+    
+    if start_date is not None:
+        dates=[d for d in dates if d>=start_date]
+    if end_date is not None:
+        dates=[d for d in dates if d<=end_date]
+    
+    SGD_files=[inpath+d+os.sep+temporal_variables[0]+'.tif' for d in dates]
+    B_files=[inpath+d+os.sep+temporal_variables[1]+'.tif' for d in dates]
+    
+    return SGD_files, B_files
     
-    with Pool(nb_cores) as p:
-        for rv in p.map(c.correlation, range(0,len(combinations))):
-            x=combinations[op][0]
-            y=combinations[op][1]
-            rvalues[x,y]=rv
-            op=op+1
-            
-end_time = time.time()
-duration=(end_time - start_time)/60
-print("--- Processing time: %.5f minutes ---" %duration)
-   
 
 
+if __name__ == '__main__' and not temporal:
+    
+    c=SGD_B_correlation()
+    SGD_dims, B_dims=c.variables_dimensions()
+    SGD_path, B_path=c.get_variables_names()
+    
+    
+    if SGD_dims!=B_dims:
+        print('The variables have different dimensions... Downsampling the highest resolution...')
+        variables = {np.prod(SGD_dims):SGD_path, np.prod(B_dims):B_path}
+        
+        from rasterio.warp import reproject, Resampling
+        
+        #source
+        src_filename = variables.get(max(variables))
+        src = rasterio.open(src_filename)
+        
+        #raster to match
+        match_filename = variables.get(min(variables))
+        match_ds = rasterio.open(match_filename)
+        
+        #output/destination, 0 outside the source and where it has no data
+        to_resample_name=variables.get(max(variables)).split('/')[-1].split('.')[0]
+        dst_filename = outpath+to_resample_name+'_resampled.tif'
+        dst_nodata = None if src.nodata is None else np.nan
+        dst_data = np.full((match_ds.height, match_ds.width), 
+                           0 if dst_nodata is None else np.nan, dtype=np.float32)
+        
+        #run
+        reproject(source=src.read(1).astype(np.float32), destination=dst_data,
+                  src_transform=src.transform, src_crs=src.crs, src_nodata=src.nodata,
+                  dst_transform=match_ds.transform, dst_crs=match_ds.crs,
+                  dst_nodata=dst_nodata, resampling=Resampling.nearest)
+        if dst_nodata is not None:
+            dst_data[np.isnan(dst_data)] = 0
+        
+        profile = match_ds.profile
+        profile.update(nodata=None)
+        write_cog(dst_filename, dst_data, profile, resampling='average')
+        
+        c.__init__(SGD=variables.get(min(variables)), B=dst_filename)
+        
+        
+    
+    start_time = time.time()
+    
+    if resolutions is not None:
+        output_filenames={resolution: outpath+output_name+'_'+str(resolution)+'px.tif' 
+                          for resolution in resolutions}
+    else:
+        output_filenames={c.res*2: outpath+output_name+'.tif'}
+    
+    if tiled:
+        c.tiled(output_filenames, full_statistics=full_statistics, 
+                tile_size=tile_size, nb_cores=nb_cores)
+        
+    else:
+        SGD, B=c.load_variables()
+        B[np.isnan(SGD)]=np.nan
+        
+        outputs=c.multiscale(SGD, B, list(output_filenames.keys()), full_statistics)
+        
+        profile=rasterio.open(SGD_path).profile
+        
+        for resolution, results in outputs.items():
+            write_cog(output_filenames[resolution], results.astype(np.float64), profile, 
+                      resampling='average', 
+                      band_descriptions=c.statistics if full_statistics else None)
+                
+    end_time = time.time()
+    duration=(end_time - start_time)/60
+    print("--- Processing time: %.5f minutes ---" %duration)
 
-temp=rasterio.open(SGD_path)
-profile=temp.profile
-profile.update(dtype=rasterio.float64)
 
-with rasterio.open(outpath+output_name+'.tif', 'w', **profile) as dst:
-        dst.write(rvalues, 1)
+
+if __name__ == '__main__' and temporal:
+    
+    SGD_files, B_files = get_date_files(inpath, temporal_variables, 
+                                        start_date=start_date, end_date=end_date)
+    c=SGD_B_temporal_correlation(SGD_files, B_files)
+    
+    start_time = time.time()
+    
+    if full_statistics:
+        results=c.regression()
+    else:
+        results=c.correlation()[np.newaxis]
+    
+    profile=rasterio.open(SGD_files[0]).profile
+    
+    write_cog(outpath+output_name+'_temporal.tif', results.astype(np.float64), profile,
+              resampling='average', 
+              band_descriptions=c.statistics if full_statistics else None)
+    
+    end_time = time.time()
+    duration=(end_time - start_time)/60
+    print("--- Processing time: %.5f minutes ---" %duration)
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
+
+
+Precomputes terrain horizon angles for a set of azimuth sectors from the
+regional ArcticDEM elevation clipped by extract_arcticdem.py. The resulting
+lookup table is used in get_IBOAR.py to flag pixels in cast shadow with a
+cheap interpolation against SAA and SZA, without any ray tracing at run time.
+
+For each azimuth sector, the horizon angle of a pixel is the maximum elevation
+angle of the terrain seen from this pixel along the sector direction, up to
+max_distance. Azimuths are given clockwise from grid north, consistently with
+the ArcticDEM derived slope aspects.
+
+Function is run in default mode at the end of the script.
+
+
+INPUTS:
+    inpath_adem: path to the folder containing regional ArcticDEM elevations
+                 ({region}_arcticdem_elevation.tif) [string]
+    region: region over which the horizon angles are computed [string]
+    nb_sectors: number of azimuth sectors, evenly spaced from 0° [int]
+    max_distance: distance in meters up to which the terrain is scanned [float]
+    nb_steps: number of distances sampled along each azimuth, geometrically
+              spaced between one pixel and max_distance [int]
+    outpath: path where to save {region}_arcticdem_horizon.tif [string]
+
+OUTPUTS:
+    {outpath}/{region}_arcticdem_horizon.tif: horizon angles in degrees, one
+                                              band per azimuth sector [.tif]
+
+"""
+
+import numpy as np
+import rasterio
+import time
+from sice_cog import get_cog_profile, add_overviews
+
+
+time_it=True
+verbose=True
+
+inpath_adem='/srv/home/8675309/AW/'
+region='Greenland'
+nb_sectors=16
+max_distance=20000
+nb_steps=64
+outpath='/srv/home/8675309/AW/'
+
+
+
+def get_sector_azimuths(nb_sectors=nb_sectors):
+    '''
+
+    INPUTS:
+        nb_sectors: number of azimuth sectors [int]
+
+    OUTPUTS:
+        azimuths: sector azimuths in degrees, clockwise from grid north [array]
+
+    '''
+
+    return np.arange(nb_sectors)*360/nb_sectors
+
+
+
+def compute_horizon_angle(elevation,azimuth,pixel_size,max_distance=max_distance,
+                          nb_steps=nb_steps):
+    '''
+
+    Computes the horizon angle of each pixel along a given azimuth by shifting
+    the whole elevation grid, so that each distance only costs a few array
+    operations.
+
+    INPUTS:
+        elevation: elevation raster, no data set to NaN [array]
+        azimuth: direction in degrees, clockwise from grid north [float]
+        pixel_size: (x, y) pixel size in meters [tuple]
+        max_distance: distance in meters up to which the terrain is scanned [float]
+        nb_steps: number of distances sampled along the azimuth [int]
+
+    OUTPUTS:
+        horizon: horizon angles in degrees, 0 for an open horizon [array]
+
+    '''
+
+    height, width = elevation.shape
+
+    #unit direction in pixels (rows are increasing southwards)
+    dcol=np.sin(np.deg2rad(azimuth))
+    drow=-np.cos(np.deg2rad(azimuth))
+
+    #distances in pixels, denser close to the pixel where shadows are sharper
+    max_steps=max(1,max_distance/min(pixel_size))
+    distances=np.geomspace(1,max_steps,nb_steps)
+    offsets=np.unique(np.column_stack((np.round(distances*drow),
+                                       np.round(distances*dcol))).astype(int),axis=0)
+
+    horizon=np.zeros((height,width),dtype=np.float32)
+
+    for off_row, off_col in offsets:
+
+        if (off_row==0 and off_col==0) or abs(off_row)>=height or abs(off_col)>=width:
+            continue
+
+        distance=np.hypot(off_row*pixel_size[1],off_col*pixel_size[0])
+
+        #elevation of the pixel located at the offset, NaN outside the grid
+        shifted=np.full((height,width),np.nan,dtype=np.float32)
+        shifted[max(0,-off_row):height-max(0,off_row),max(0,-off_col):width-max(0,off_col)]=\
+            elevation[max(0,off_row):height-max(0,-off_row),max(0,off_col):width-max(0,-off_col)]
+
+        angle=np.rad2deg(np.arctan((shifted-elevation)/distance))
+        horizon=np.fmax(horizon,angle)
+
+    return horizon
+
+
+
+def get_horizon_angles(inpath_adem=inpath_adem,region=region,nb_sectors=nb_sectors,
+                       max_distance=max_distance,nb_steps=nb_steps,outpath=outpath,
+                       verbose=verbose):
+    '''
+
+    Builds the horizon angle lookup table of a given region. Sectors are
+    computed and written one at a time to keep memory usage at a few times
+    the size of the elevation grid.
+
+    INPUTS:
+        inpath_adem: path to the folder containing regional ArcticDEM elevations [string]
+        region: region over which the horizon angles are computed [string]
+        nb_sectors: number of azimuth sectors [int]
+        max_distance: distance in meters up to which the terrain is scanned [float]
+        nb_steps: number of distances sampled along each azimuth [int]
+        outpath: path where to save {region}_arcticdem_horizon.tif [string]
+        verbose: set to True to print details about processing [boolean]
+
+    OUTPUTS:
+        {outpath}/{region}_arcticdem_horizon.tif: horizon angles in degrees, one
+                                                  band per azimuth sector. Sector
+                                                  azimuths are stored in the
+                                                  band tags. Tiled and compressed
+                                                  with overviews, see sice_cog.py
+                                                  [.tif]
+
+    '''
+
+    src=rasterio.open(inpath_adem+region+'_arcticdem_elevation.tif')
+    elevation=src.read(1).astype(np.float32)
+    if src.nodata is not None:
+        elevation[elevation==src.nodata]=np.nan
+    pixel_size=(abs(src.transform[0]),abs(src.transform[4]))
+
+    #band interleaved, sectors being written one at a time
+    profile=get_cog_profile(src.profile)
+    profile.update(dtype=rasterio.float32,count=nb_sectors,nodata=None,
+                   interleave='band')
+
+    azimuths=get_sector_azimuths(nb_sectors)
+
+    output_filename=outpath+region+'_arcticdem_horizon.tif'
+    with rasterio.open(output_filename,'w',**profile) as dst:
+        for i, azimuth in enumerate(azimuths):
+            if verbose:
+                print('Computing horizon angles for %s at %.1f°...' %(region,azimuth))
+            horizon=compute_horizon_angle(elevation,azimuth,pixel_size,
+                                          max_distance=max_distance,
+                                          nb_steps=nb_steps)
+            dst.write(horizon,i+1)
+            dst.update_tags(i+1,azimuth=azimuth)
+
+    add_overviews(output_filename,resampling='average')
+
+    return output_filename
+
+
+
+if __name__=='__main__':
+
+    if time_it:
+        start_time = time.time()
+
+    get_horizon_angles()
+
+    if time_it:
+        end_time = time.time()
+        processing_time=(end_time - start_time)/60
+        if verbose:
+            print('--- Processing time: %.3f minutes ---' %processing_time)
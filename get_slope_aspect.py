@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
+
+
+Derives slopes and slope aspects from the regional ArcticDEM elevation clipped
+by extract_arcticdem.py, as a replacement of the SNAP Slope Calculation
+operator. Derivatives are computed on any grid without going back to the
+pan-Arctic DEM.
+
+The elevation is processed tile by tile over a process pool. Each tile is read
+with a one pixel halo so that results are identical to the ones of the whole
+grid; grid edges are extended by repeating the edge pixels. Horn (3x3 weighted)
+and Zevenbergen-Thorne (4 neighbours) finite differences are available.
+
+Slopes are given in degrees. Slope aspects are the downslope directions in
+degrees, clockwise from grid north, consistently with get_horizon_angles.py and
+get_IBOAR.py. Flat pixels have an aspect of 0.
+
+Function is run in default mode at the end of the script.
+
+
+INPUTS:
+    inpath_adem: path to the folder containing regional ArcticDEM elevations
+                 ({region}_arcticdem_elevation.tif) [string]
+    region: region over which slopes and slope aspects are computed [string]
+    method: 'horn' or 'zevenbergen_thorne' [string]
+    tile_size: side length of the tiles in pixels, multiple of 16 [int]
+    nb_cores: number of cores used to process the tiles [int]
+    outpath: path where to save the outputs [string]
+
+OUTPUTS:
+    {outpath}/{region}_arcticdem_slope.tif: slopes in degrees [.tif]
+    {outpath}/{region}_arcticdem_aspect.tif: slope aspects in degrees [.tif]
+
+"""
+
+import numpy as np
+import rasterio
+from rasterio.windows import Window
+from multiprocessing import Pool
+import multiprocessing
+import time
+from sice_cog import add_overviews
+
+
+time_it=True
+verbose=True
+
+inpath_adem='/srv/home/8675309/AW/'
+region='Greenland'
+method='horn'
+tile_size=1024
+nb_cores=multiprocessing.cpu_count()
+outpath='/srv/home/8675309/AW/'
+
+
+
+def compute_slope_aspect(elevation,pixel_size,method=method):
+    '''
+
+    INPUTS:
+        elevation: elevation raster with a one pixel halo, no data set to
+                   NaN [array]
+        pixel_size: (x, y) pixel size in meters [tuple]
+        method: 'horn' or 'zevenbergen_thorne' [string]
+
+    OUTPUTS:
+        slope: slopes in degrees, without the halo [array]
+        aspect: slope aspects in degrees, clockwise from grid north, 0 on
+                flat pixels, without the halo [array]
+
+    '''
+
+    #neighbours of each pixel (rows are increasing southwards)
+    #  a b c
+    #  d e f
+    #  g h i
+    a=elevation[:-2,:-2]; b=elevation[:-2,1:-1]; c=elevation[:-2,2:]
+    d=elevation[1:-1,:-2];                       f=elevation[1:-1,2:]
+    g=elevation[2:,:-2];  h=elevation[2:,1:-1];  i=elevation[2:,2:]
+
+    if method=='horn':
+        dzdx=((c+2*f+i)-(a+2*d+g))/(8*pixel_size[0])
+        dzdy=((a+2*b+c)-(g+2*h+i))/(8*pixel_size[1])
+    elif method=='zevenbergen_thorne':
+        dzdx=(f-d)/(2*pixel_size[0])
+        dzdy=(b-h)/(2*pixel_size[1])
+    else:
+        raise ValueError("method must be 'horn' or 'zevenbergen_thorne'")
+
+    slope=np.rad2deg(np.arctan(np.hypot(dzdx,dzdy)))
+
+    #downslope direction, dzdy being positive northwards
+    aspect=np.mod(np.rad2deg(np.arctan2(-dzdx,-dzdy)),360)
+    #no downslope direction on flat pixels (arctan2(-0.,-0.) being 180)
+    aspect[slope==0]=0
+
+    return slope.astype(np.float32), aspect.astype(np.float32)
+
+
+
+def get_tiles(height,width,tile_size=tile_size):
+    '''
+
+    INPUTS:
+        height: number of rows of the grid [int]
+        width: number of columns of the grid [int]
+        tile_size: side length of the tiles in pixels [int]
+
+    OUTPUTS:
+        tiles: windows covering the grid [list]
+
+    '''
+
+    tiles=[Window(col,row,min(tile_size,width-col),min(tile_size,height-row))
+           for row in range(0,height,tile_size)
+           for col in range(0,width,tile_size)]
+
+    return tiles
+
+
+
+def tile_processing(args):
+    '''
+
+    Runs compute_slope_aspect() on a tile extended by a one pixel halo.
+    Missing halo pixels at the grid edges are filled with the edge pixels.
+
+    INPUTS:
+        args: path of the elevation raster, tile window and method [tuple]
+
+    OUTPUTS:
+        tile: tile window [rasterio.windows.Window]
+        slope: slopes of the tile [array]
+        aspect: slope aspects of the tile [array]
+
+    '''
+
+    elevation_file, tile, method = args
+
+    with rasterio.open(elevation_file) as src:
+
+        height, width = src.shape
+        pixel_size=(abs(src.transform[0]),abs(src.transform[4]))
+
+        #tile extended by the halo, clipped to the grid
+        row0=max(0,tile.row_off-1)
+        row1=min(height,tile.row_off+tile.height+1)
+        col0=max(0,tile.col_off-1)
+        col1=min(width,tile.col_off+tile.width+1)
+
+        elevation=src.read(1,window=Window.from_slices((row0,row1),(col0,col1))).astype(np.float64)
+        if src.nodata is not None:
+            elevation[elevation==src.nodata]=np.nan
+
+    pad=((row0-(tile.row_off-1),(tile.row_off+tile.height+1)-row1),
+         (col0-(tile.col_off-1),(tile.col_off+tile.width+1)-col1))
+    elevation=np.pad(elevation,pad,mode='edge')
+
+    slope, aspect = compute_slope_aspect(elevation,pixel_size,method=method)
+
+    return tile, slope, aspect
+
+
+
+def get_slope_aspect(inpath_adem=inpath_adem,region=region,method=method,
+                     tile_size=tile_size,nb_cores=nb_cores,outpath=outpath,
+                     verbose=verbose):
+    '''
+
+    Computes slopes and slope aspects of a given region in one pass over the
+    elevation tiles, both outputs being written as tiles are processed.
+
+    INPUTS:
+        inpath_adem: path to the folder containing regional ArcticDEM elevations [string]
+        region: region over which slopes and slope aspects are computed [string]
+        method: 'horn' or 'zevenbergen_thorne' [string]
+        tile_size: side length of the tiles in pixels, multiple of 16 [int]
+        nb_cores: number of cores used to process the tiles [int]
+        outpath: path where to save the outputs [string]
+        verbose: set to True to print details about processing [boolean]
+
+    OUTPUTS:
+        {outpath}/{region}_arcticdem_slope.tif: slopes in degrees [.tif]
+        {outpath}/{region}_arcticdem_aspect.tif: slope aspects in degrees [.tif]
+        output_filenames: paths of the outputs by variable [dictionary]
+
+    '''
+
+    elevation_file=inpath_adem+region+'_arcticdem_elevation.tif'
+
+    with rasterio.open(elevation_file) as src:
+        profile=src.profile
+        height, width = src.shape
+
+    profile.update(driver='GTiff',dtype=rasterio.float32,count=1,nodata=np.nan,
+                   tiled=True,blockxsize=tile_size,blockysize=tile_size,
+                   compress='deflate')
+
+    output_filenames={var: outpath+region+'_arcticdem_'+var+'.tif'
+                      for var in ['slope','aspect']}
+
+    tasks=[(elevation_file,tile,method) for tile in get_tiles(height,width,tile_size)]
+
+    with rasterio.open(output_filenames['slope'],'w',**profile) as dst_slope, \
+         rasterio.open(output_filenames['aspect'],'w',**profile) as dst_aspect:
+
+        with Pool(nb_cores) as p:
+            for k, (tile, slope, aspect) in enumerate(p.imap_unordered(tile_processing,
+                                                                       tasks)):
+                dst_slope.write(slope,1,window=tile)
+                dst_aspect.write(aspect,1,window=tile)
+                if verbose:
+                    print(k+1,'/',len(tasks))
+
+    add_overviews(output_filenames['slope'],resampling='average')
+    add_overviews(output_filenames['aspect'])
+
+    return output_filenames
+
+
+
+if __name__=='__main__':
+
+    if time_it:
+        start_time = time.time()
+
+    get_slope_aspect()
+
+    if time_it:
+        end_time = time.time()
+        processing_time=(end_time - start_time)/60
+        if verbose:
+            print('--- Processing time: %.3f minutes ---' %processing_time)
@@ -0,0 +1,310 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
+
+
+Extracts the time series of a SICE variable at a given location across the
+SICE date folders (e.g. albedo, SGD or cloud mask history of a pixel).
+
+Files are found with a per-variable index of date -> file, built from the
+date folders, stored in a .csv file and updated when date folders are added or
+removed. Single pixels are then read with windowed reads spread over a pool of
+threads, so that only one block per date is decoded.
+
+For repeated queries over a season, the index can be turned into a time cube:
+a single pixel-interleaved and tiled .tif file with one band per date, so that
+the whole series of a pixel is stored in a single block. The cube is used
+instead of the date folders when it exists. Set build_cube to True to build
+it from all the dates of the index before extracting the series.
+
+Function is run in default mode at the end of the script.
+
+
+INPUTS:
+    inpath: path to the folder containing SICE date folders [string]
+    variable: name of the variable (file name without extension) [string]
+    x, y: coordinates of the pixel in the CRS of the rasters [float]
+    start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to
+                          None to use all the dates [string,NoneType]
+    nb_threads: number of files read at the same time [int]
+    outpath: path where to save the index, the time cube and the series [string]
+    build_cube: set to True to (re)build the time cube from the index [boolean]
+
+OUTPUTS:
+    {outpath}/{variable}_date_index.csv: date -> file index [.csv]
+    {outpath}/{variable}_time_cube.tif: time cube, if build_cube is True [.tif]
+    {outpath}/{variable}_time_series.csv: time series at (x, y) [.csv]
+
+"""
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.windows import Window
+from concurrent.futures import ThreadPoolExecutor
+import os
+import time
+
+
+time_it=True
+verbose=True
+
+inpath='/srv/home/8675309/SICEv0/'
+variable='albedo_bb_planar_sw'
+x=-200000
+y=-2200000
+start_date='2019-06-01'
+end_date='2019-08-31'
+nb_threads=16
+outpath='/srv/home/8675309/AW/'
+build_cube=False
+
+
+
+def build_date_index(inpath=inpath,variable=variable,start_date=None,end_date=None,
+                     index_file=None,variables_extension='.tif'):
+    '''
+
+    INPUTS:
+        inpath: path to the folder containing SICE date folders [string]
+        variable: name of the variable [string]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to
+                              None to use all the dates [string,NoneType]
+        index_file: path of the .csv file storing the index. The index is
+                    loaded from it if it exists and updated with the date
+                    folders added or removed since, built otherwise, and
+                    saved when it changed. Set to None to keep the index in
+                    memory only [string,NoneType]
+        variables_extension: extension of the files in which variables are
+                             stored [string]
+
+    OUTPUTS:
+        date_index: paths of the variable indexed by date [pandas.Series]
+
+    '''
+
+    from SICE_products_availability import get_folder_date, list_date_folders
+
+    #files of the stored index are not checked again, only the ones of new
+    #date folders (e.g. NRT)
+    if index_file is not None and os.path.isfile(index_file):
+        indexed_paths=pd.read_csv(index_file)['path'].tolist()
+    else:
+        indexed_paths=None
+
+    known_paths=set(indexed_paths or [])
+    folders=list_date_folders(inpath)
+    paths=[inpath+folder+os.sep+variable+variables_extension for folder in folders]
+    available=[(get_folder_date(folder),path) for folder, path in zip(folders,paths)
+               if path in known_paths or os.path.isfile(path)]
+
+    date_index=pd.Series([path for _, path in available],
+                         index=pd.DatetimeIndex([date for date, _ in available],name='date'),
+                         name='path')
+
+    if index_file is not None and date_index.tolist()!=indexed_paths:
+        date_index.to_csv(index_file,header=True)
+
+    if start_date is not None:
+        date_index=date_index[date_index.index>=pd.to_datetime(start_date)]
+    if end_date is not None:
+        date_index=date_index[date_index.index<=pd.to_datetime(end_date)]
+
+    return date_index
+
+
+
+def read_pixel(path,x,y):
+    '''
+
+    INPUTS:
+        path: path of the raster [string]
+        x, y: coordinates of the pixel in the CRS of the raster [float]
+
+    OUTPUTS:
+        value: value of the pixel, NaN for no data or outside the raster [float]
+
+    '''
+
+    with rasterio.open(path) as src:
+
+        row, col = src.index(x,y)
+
+        if not (0<=row<src.height and 0<=col<src.width):
+            return np.nan
+
+        value=src.read(1,window=Window(col,row,1,1))[0,0]
+
+        if src.nodata is not None and value==src.nodata:
+            return np.nan
+
+    return float(value)
+
+
+
+def read_pixel_series(date_index,x,y,nb_threads=nb_threads):
+    '''
+
+    INPUTS:
+        date_index: paths of the variable indexed by date, see
+                    build_date_index() [pandas.Series]
+        x, y: coordinates of the pixel in the CRS of the rasters [float]
+        nb_threads: number of files read at the same time [int]
+
+    OUTPUTS:
+        series: values of the pixel indexed by date [pandas.Series]
+
+    '''
+
+    with ThreadPoolExecutor(max_workers=nb_threads) as executor:
+        values=list(executor.map(lambda path: read_pixel(path,x,y),date_index.values))
+
+    return pd.Series(values,index=date_index.index)
+
+
+
+def build_time_cube(date_index,cube_file,blocksize=64,verbose=verbose):
+    '''
+
+    Stacks the rasters of an index in a pixel-interleaved, tiled and
+    compressed .tif file with one band per date. The cube is written by strips
+    of blocksize rows so that only one strip per date is held in memory.
+    Rasters are assumed to share the same grid.
+
+    INPUTS:
+        date_index: paths of the variable indexed by date, see
+                    build_date_index() [pandas.Series]
+        cube_file: path of the time cube [string]
+        blocksize: side length of the internal tiles, multiple of 16 [int]
+        verbose: set to True to print details about processing [boolean]
+
+    OUTPUTS:
+        {cube_file}: time cube, band descriptions are the dates [.tif]
+
+    '''
+
+    with rasterio.open(date_index.values[0]) as src:
+        profile=src.profile
+        height, width = src.shape
+
+    profile.update(driver='GTiff',count=len(date_index),interleave='pixel',
+                   tiled=True,blockxsize=blocksize,blockysize=blocksize,
+                   compress='deflate')
+
+    with rasterio.open(cube_file,'w',**profile) as dst:
+
+        for i, date in enumerate(date_index.index):
+            dst.set_band_description(i+1,date.strftime('%Y-%m-%d'))
+
+        for row in range(0,height,blocksize):
+            strip=Window(0,row,width,min(blocksize,height-row))
+            if verbose:
+                print('Writing rows %d to %d...' %(row,row+strip.height))
+            stack=np.empty((len(date_index),strip.height,width),dtype=profile['dtype'])
+            for i, path in enumerate(date_index.values):
+                with rasterio.open(path) as src:
+                    stack[i]=src.read(1,window=strip)
+            dst.write(stack,window=strip)
+
+    return cube_file
+
+
+
+def read_time_cube(cube_file,x,y,start_date=None,end_date=None):
+    '''
+
+    INPUTS:
+        cube_file: path of the time cube, see build_time_cube() [string]
+        x, y: coordinates of the pixel in the CRS of the cube [float]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to
+                              None to use all the dates [string,NoneType]
+
+    OUTPUTS:
+        series: values of the pixel indexed by date [pandas.Series]
+
+    '''
+
+    with rasterio.open(cube_file) as src:
+
+        dates=pd.to_datetime(list(src.descriptions))
+        row, col = src.index(x,y)
+
+        if not (0<=row<src.height and 0<=col<src.width):
+            values=np.full(src.count,np.nan)
+        else:
+            values=src.read(window=Window(col,row,1,1))[:,0,0].astype(np.float64)
+            if src.nodata is not None:
+                values[values==src.nodata]=np.nan
+
+    series=pd.Series(values,index=pd.DatetimeIndex(dates,name='date'))
+
+    if start_date is not None:
+        series=series[series.index>=pd.to_datetime(start_date)]
+    if end_date is not None:
+        series=series[series.index<=pd.to_datetime(end_date)]
+
+    return series
+
+
+
+def get_time_series(inpath=inpath,variable=variable,x=x,y=y,start_date=start_date,
+                    end_date=end_date,nb_threads=nb_threads,index_file=None,
+                    cube_file=None):
+    '''
+
+    Reads the time series of a pixel from the time cube if it exists, from the
+    date folders otherwise.
+
+    INPUTS:
+        inpath: path to the folder containing SICE date folders [string]
+        variable: name of the variable [string]
+        x, y: coordinates of the pixel in the CRS of the rasters [float]
+        start_date, end_date: dates (YYYY-MM-DD) delimiting the period, set to
+                              None to use all the dates [string,NoneType]
+        nb_threads: number of files read at the same time [int]
+        index_file: path of the .csv index, see build_date_index()
+                    [string,NoneType]
+        cube_file: path of the time cube, see build_time_cube()
+                   [string,NoneType]
+
+    OUTPUTS:
+        series: values of the pixel indexed by date [pandas.Series]
+
+    '''
+
+    if cube_file is not None and os.path.isfile(cube_file):
+        series=read_time_cube(cube_file,x,y,start_date=start_date,end_date=end_date)
+
+    else:
+        date_index=build_date_index(inpath,variable,start_date=start_date,
+                                    end_date=end_date,index_file=index_file)
+        series=read_pixel_series(date_index,x,y,nb_threads=nb_threads)
+
+    series.name=variable
+
+    return series
+
+
+
+if __name__=='__main__':
+
+    if time_it:
+        start_time = time.time()
+
+    index_file=outpath+variable+'_date_index.csv'
+    cube_file=outpath+variable+'_time_cube.tif'
+
+    if build_cube:
+        #all the dates, the period is selected when reading the cube
+        date_index=build_date_index(inpath,variable,index_file=index_file)
+        build_time_cube(date_index,cube_file)
+
+    series=get_time_series(index_file=index_file,cube_file=cube_file)
+    series.to_csv(outpath+variable+'_time_series.csv',header=True)
+
+    if time_it:
+        end_time = time.time()
+        processing_time=(end_time - start_time)/60
+        if verbose:
+            print('--- Processing time: %.3f minutes ---' %processing_time)
@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+"""
+
+@author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
+
+Shared output stage of the SICE tools. Products are written as tiled and
+compressed Cloud-Optimized-GeoTIFF-style files with internal overviews, so
+that subsets and zoomed-out views (e.g. in sice_tools_gui.py) only read a
+fraction of the file.
+
+Rasters are assembled in memory, their overviews built, and the result is
+copied to disk with the overviews stored ahead of the full resolution data.
+Rasters written tile by tile can be given overviews afterwards with
+add_overviews().
+
+"""
+
+import numpy as np
+import rasterio
+import rasterio.shutil
+from rasterio.io import MemoryFile
+from rasterio.enums import Resampling
+
+
+def get_cog_profile(profile,blocksize=512,compress='deflate'):
+    '''
+
+    INPUTS:
+        profile: profile of the raster to write [rasterio.profiles.Profile,dictionary]
+        blocksize: side length of the internal tiles, multiple of 16 [int]
+        compress: compression method [string]
+
+    OUTPUTS:
+        cog_profile: tiled and compressed GeoTIFF profile [dictionary]
+
+    '''
+
+    cog_profile=dict(profile)
+
+    #striped layout options of the source profile are replaced
+    for key in ['blockxsize','blockysize','tiled','interleave','compress',
+                'predictor']:
+        cog_profile.pop(key,None)
+
+    cog_profile.update(driver='GTiff',tiled=True,blockxsize=blocksize,
+                       blockysize=blocksize,compress=compress)
+
+    return cog_profile
+
+
+def get_overview_levels(width,height,blocksize=512):
+    '''
+
+    INPUTS:
+        width: number of columns of the raster [int]
+        height: number of rows of the raster [int]
+        blocksize: side length of the internal tiles [int]
+
+    OUTPUTS:
+        levels: decimation factors, down to an overview fitting in a single
+                tile [list]
+
+    '''
+
+    levels=[]
+    factor=2
+
+    while max(width,height)/(factor/2)>blocksize:
+        levels.append(factor)
+        factor*=2
+
+    return levels
+
+
+def write_cog(filename,data,profile,resampling='nearest',blocksize=512,
+              compress='deflate',band_descriptions=None,tags=None,band_tags=None):
+    '''
+
+    Writes a Cloud-Optimized-GeoTIFF-style file: tiled, compressed and with
+    internal overviews stored ahead of the full resolution data.
+
+    INPUTS:
+        filename: path of the output .tif file [string]
+        data: raster to write, 2D for a single band, 3D (bands first)
+              otherwise [array]
+        profile: profile of the raster, dtype, count and dimensions are
+                 taken from data [rasterio.profiles.Profile,dictionary]
+        resampling: resampling method of the overviews, 'nearest' for
+                    classes and flags, 'average' for continuous variables
+                    [string]
+        blocksize: side length of the internal tiles, multiple of 16 [int]
+        compress: compression method [string]
+        band_descriptions: description of each band [list,NoneType]
+        tags: dataset tags [dictionary,NoneType]
+        band_tags: tags of each band [list,NoneType]
+
+    OUTPUTS:
+        {filename}: tiled and compressed .tif file with internal overviews [.tif]
+
+    '''
+
+    data=np.asarray(data)
+    if data.ndim==2:
+        data=data[np.newaxis]
+
+    cog_profile=get_cog_profile(profile,blocksize=blocksize,compress=compress)
+    cog_profile.update(dtype=data.dtype.name,count=data.shape[0],
+                       height=data.shape[1],width=data.shape[2])
+
+    levels=get_overview_levels(data.shape[2],data.shape[1],blocksize=blocksize)
+
+    with MemoryFile() as memfile:
+        with memfile.open(**cog_profile) as mem:
+            mem.write(data)
+
+            if band_descriptions is not None:
+                for i, description in enumerate(band_descriptions):
+                    mem.set_band_description(i+1,description)
+            if tags is not None:
+                mem.update_tags(**tags)
+            if band_tags is not None:
+                for i, band_tag in enumerate(band_tags):
+                    mem.update_tags(i+1,**band_tag)
+
+            if levels:
+                mem.build_overviews(levels,Resampling[resampling])
+
+            #overviews first, then full resolution
+            rasterio.shutil.copy(mem,filename,copy_src_overviews=True,
+                                 **{key: value for key, value in cog_profile.items()
+                                    if key in ['tiled','blockxsize','blockysize',
+                                               'compress']})
+
+
+def add_overviews(filename,resampling='nearest',blocksize=512):
+    '''
+
+    Adds internal overviews to an existing raster, e.g. written tile by tile.
+
+    INPUTS:
+        filename: path of the .tif file [string]
+        resampling: resampling method of the overviews [string]
+        blocksize: side length of the internal tiles [int]
+
+    OUTPUTS:
+        {filename}: same file with internal overviews [.tif]
+
+    '''
+
+    with rasterio.open(filename,'r+') as dst:
+        levels=get_overview_levels(dst.width,dst.height,blocksize=blocksize)
+        if levels:
+            dst.build_overviews(levels,Resampling[resampling])
+            dst.update_tags(ns='rio_overview',resampling=resampling)
@@ -8,6 +8,8 @@
 
 
 import sys
+import os
+import threading
 from PyQt5.QtWidgets import *
 from PyQt5.QtGui import *
 from PyQt5.QtCore import *
@@ -16,13 +18,190 @@ import matplotlib.pyplot as plt
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.backends.backend_qt5agg import NavigationToolbar2QT as NavigationToolbar
 import rasterio
-from rasterio.plot import show
+from rasterio.windows import Window, from_bounds
 import numpy as np
-import scipy
-import scipy.ndimage
 import math
 import pandas as pd
-import urllib
+import urllib.request
+from collections import OrderedDict
+from extract_profiles import extract_profile
+from get_time_series import build_date_index, read_pixel_series, read_time_cube
+
+
+#logos are downloaded once and then loaded from this folder
+assets_path=os.path.join(os.path.dirname(os.path.abspath(__file__)), 'assets')
+logos={'GEUS.png': 'https://i2.wp.com/snow.geus.dk/wp-content/uploads/GEUS.png?zoom=1.5&resize=166%2C204',
+       'Sentinel-3_over_Greenland.png': 'https://i0.wp.com/snow.geus.dk/wp-content/uploads/cropped-Sentinel-3_over_Greenland-1.png?w=1200'}
+
+
+#memory budget of the decoded raster tiles kept for pan/zoom, in bytes
+tile_cache_memory=512*1024**2
+#side length of the tiles read for display, in pixels of the overview level
+tile_size=256
+
+
+class TileCache():
+    '''
+    Least recently used cache of decoded raster tiles, keyed by (file, 
+    overview level, tile index). Tiles are evicted once the memory budget 
+    is exceeded.
+    '''
+    
+    def __init__(self, memory_budget=tile_cache_memory):
+        self.memory_budget=memory_budget
+        self.tiles=OrderedDict()
+        self.memory=0
+        #tiles are read by the workers of the thread pool
+        self.lock=threading.Lock()
+        
+    def get(self, key):
+        with self.lock:
+            if key not in self.tiles:
+                return None
+            self.tiles.move_to_end(key)
+            return self.tiles[key]
+    
+    def put(self, key, tile):
+        with self.lock:
+            if key in self.tiles:
+                self.memory-=self.tile_memory(self.tiles.pop(key))
+            self.tiles[key]=tile
+            self.memory+=self.tile_memory(tile)
+            #keeping at least the last tile
+            while self.memory>self.memory_budget and len(self.tiles)>1:
+                _, evicted=self.tiles.popitem(last=False)
+                self.memory-=self.tile_memory(evicted)
+            
+    @staticmethod
+    def tile_memory(tile):
+        return tile.data.nbytes+np.ma.getmaskarray(tile).nbytes
+    
+
+tile_cache=TileCache()
+
+#datasets opened by each thread, rasterio datasets can't be shared between threads
+opened_datasets=threading.local()
+
+
+def get_dataset(filename):
+    '''
+    INPUTS:
+        filename: path of the raster [string]
+        
+    OUTPUTS:
+        src: raster opened once per thread [rasterio.io.DatasetReader]
+    
+    '''
+    
+    if not hasattr(opened_datasets, 'datasets'):
+        opened_datasets.datasets={}
+    if filename not in opened_datasets.datasets:
+        opened_datasets.datasets[filename]=rasterio.open(filename)
+        
+    return opened_datasets.datasets[filename]
+
+
+def read_tiles(filename, level, tile_rows, tile_cols, progress_callback=None):
+    '''
+    Reads and mosaics the tiles of a raster at a given overview level, tiles 
+    being taken from tile_cache when available.
+    
+    INPUTS:
+        filename: path of the raster [string]
+        level: decimation factor, power of 2 [int]
+        tile_rows, tile_cols: indexes of the tiles to read [range]
+        progress_callback: function receiving progress messages [function]
+        
+    OUTPUTS:
+        rview: mosaic of the tiles, no data masked [masked array]
+        extent: (left, right, bottom, top) extent of rview [tuple]
+    
+    '''
+    
+    src = get_dataset(filename)
+    full_window = Window(0, 0, src.width, src.height)
+    span = tile_size*level
+    nb_tiles = len(tile_rows)*len(tile_cols)
+    
+    rows = []
+    for tile_row in tile_rows:
+        row = []
+        for tile_col in tile_cols:
+            key = (filename, level, tile_row, tile_col)
+            tile = tile_cache.get(key)
+            if tile is None:
+                tile_window = Window(tile_col*span, tile_row*span, span, span)
+                tile_window = tile_window.intersection(full_window)
+                out_shape = (int(math.ceil(tile_window.height/level)), 
+                             int(math.ceil(tile_window.width/level)))
+                tile = src.read(1, window=tile_window, out_shape=out_shape, 
+                                masked=True)
+                tile_cache.put(key, tile)
+            row.append(tile)
+            if progress_callback is not None:
+                progress_callback('Reading raster tiles... %d/%d' 
+                                  %(len(rows)*len(tile_cols)+len(row), nb_tiles))
+        rows.append(np.ma.concatenate(row, axis=1))
+    rview = np.ma.concatenate(rows, axis=0)
+    
+    tiles_window = Window(tile_cols[0]*span, tile_rows[0]*span, 
+                          len(tile_cols)*span, len(tile_rows)*span)
+    tiles_window = tiles_window.intersection(full_window)
+    left, bottom, right, top = rasterio.windows.bounds(tiles_window, src.transform)
+    
+    return rview, (left, right, bottom, top)
+
+
+def download_asset(url, filename, progress_callback=None):
+    '''
+    INPUTS:
+        url: url of the asset [string]
+        filename: path where to cache the asset [string]
+        progress_callback: function receiving progress messages [function]
+        
+    OUTPUTS:
+        filename: path of the cached asset [string]
+    
+    '''
+    
+    content=urllib.request.urlopen(url, timeout=10).read()
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, 'wb') as f:
+        f.write(content)
+        
+    return filename
+
+
+class WorkerSignals(QObject):
+    finished = pyqtSignal(object)
+    error = pyqtSignal(str)
+    progress = pyqtSignal(str)
+
+
+class Worker(QRunnable):
+    '''
+    Runs a function on a thread of a QThreadPool so that the GUI stays 
+    responsive. The function receives a progress_callback keyword argument 
+    to report its progress, results and errors being sent back as signals.
+    '''
+    
+    def __init__(self, function, *args, **kwargs):
+        QRunnable.__init__(self)
+        self.function=function
+        self.args=args
+        self.kwargs=kwargs
+        self.signals=WorkerSignals()
+        self.kwargs['progress_callback']=self.signals.progress.emit
+        
+    @pyqtSlot()
+    def run(self):
+        try:
+            result=self.function(*self.args, **self.kwargs)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+        else:
+            self.signals.finished.emit(result)
+
 
 
 class MainWindow(QMainWindow):
@@ -40,30 +219,36 @@ class MainWindow(QMainWindow):
         self.width=1600
         self.height=900
         self.coords=[]
+        self.interpolation='bilinear'
+        self.archive_path=None
+        self.cube_file=None
+        self.date_indexes={}
+        self.time_series_plot=None
         self.setWindowTitle(self.title)
         self.setGeometry(self.left, self.top, self.width, self.height)
         font = QFont()
         font.setPointSize(30)
 
         self.statusBar().showMessage('Ready')
+        self.threadpool = QThreadPool.globalInstance()
         
         
         self.label = QLabel(self)
-        url = 'https://i2.wp.com/snow.geus.dk/wp-content/uploads/GEUS.png?zoom=1.5&resize=166%2C204'
-        front_img1= urllib.request.urlopen(url).read()
-        pixmap = QPixmap()
-        pixmap.loadFromData(front_img1)
-        self.label.setPixmap(pixmap)
         self.label.setGeometry((635+100)*self.width/1600, 450*self.height/900, 800*self.width/1600, 400*self.height/900)
         
         self.label2 = QLabel(self)
-        url = 'https://i0.wp.com/snow.geus.dk/wp-content/uploads/cropped-Sentinel-3_over_Greenland-1.png?w=1200'
-        front_img2= urllib.request.urlopen(url).read()
-        pixmap = QPixmap()
-        pixmap.loadFromData(front_img2)
-        self.label2.setPixmap(pixmap)
         self.label2.setGeometry((100+100)*self.width/1600,160*self.height/900,1300*self.width/1600,400*self.height/900)
         
+        #logos are loaded from the local cache, downloaded in the background otherwise
+        self.logo_labels = {'GEUS.png': self.label, 'Sentinel-3_over_Greenland.png': self.label2}
+        self.load_logos()
+        for logo, url in logos.items():
+            if not os.path.isfile(os.path.join(assets_path, logo)):
+                worker = Worker(download_asset, url, os.path.join(assets_path, logo))
+                worker.signals.finished.connect(self.load_logos)
+                worker.signals.error.connect(self.logo_unavailable)
+                self.threadpool.start(worker)
+        
         self.label3 = QLabel(self)
         self.label3.setText('SICE tools GUI')
         self.label3.setGeometry((589+100)*self.width/1600,20*self.height/900,500*self.width/1600,300*self.height/900)
@@ -78,6 +263,7 @@ class MainWindow(QMainWindow):
         showMenu = mainMenu.addMenu('View')
         toolsmenu = mainMenu.addMenu('Tools')
         createprofilemenu=toolsmenu.addMenu('Profile tool')
+        timeseriesmenu=toolsmenu.addMenu('Time series tool')
         helpMenu = mainMenu.addMenu('Help')
         
         helpinstructions = QAction('Help Contents', self)
@@ -122,8 +308,56 @@ class MainWindow(QMainWindow):
         saveprofile.setStatusTip('Save profile')
         saveprofile.triggered.connect(self.save_profile)
         createprofilemenu.addAction(saveprofile)
+        
+        interpolationmenu=createprofilemenu.addMenu('Interpolation')
+        interpolationgroup=QActionGroup(self)
+        for interpolation in ['nearest', 'bilinear']:
+            interpolationaction = QAction(interpolation.capitalize(), self, checkable=True)
+            interpolationaction.setChecked(interpolation==self.interpolation)
+            interpolationaction.setStatusTip('%s interpolation along the profile' 
+                                             %interpolation.capitalize())
+            interpolationaction.triggered.connect(lambda checked, i=interpolation: 
+                                                  setattr(self, 'interpolation', i))
+            interpolationgroup.addAction(interpolationaction)
+            interpolationmenu.addAction(interpolationaction)
+            
+        selectpixel = QAction('Select pixel...', self)
+        selectpixel.setShortcut('Ctrl+T')
+        selectpixel.setStatusTip('Select pixel')
+        selectpixel.triggered.connect(self.connect_pixel)
+        timeseriesmenu.addAction(selectpixel)
+        
+        cleartimeseries = QAction('Clear time series...', self)
+        cleartimeseries.setStatusTip('Clear time series')
+        cleartimeseries.triggered.connect(self.clear_time_series)
+        timeseriesmenu.addAction(cleartimeseries)
+        
+        savetimeseries = QAction('Save time series...', self)
+        savetimeseries.setStatusTip('Save time series')
+        savetimeseries.triggered.connect(self.save_time_series)
+        timeseriesmenu.addAction(savetimeseries)
+        
+        selectarchive = QAction('Select SICE archive...', self)
+        selectarchive.setStatusTip('Select the folder containing SICE date folders')
+        selectarchive.triggered.connect(self.select_archive)
+        timeseriesmenu.addAction(selectarchive)
+        
+        selectcube = QAction('Select time cube...', self)
+        selectcube.setStatusTip('Select a time cube built by get_time_series.py')
+        selectcube.triggered.connect(self.select_time_cube)
+        timeseriesmenu.addAction(selectcube)
             
             
+    def load_logos(self, *args):
+        for logo, label in self.logo_labels.items():
+            if os.path.isfile(os.path.join(assets_path, logo)):
+                label.setPixmap(QPixmap(os.path.join(assets_path, logo)))
+                
+                
+    def logo_unavailable(self, error):
+        self.statusBar().showMessage('Ready (logos unavailable offline)')
+        
+        
     def file_open(self):
        # need to make name an tupple otherwise i had an error and app crashed
        global name
@@ -132,8 +366,7 @@ class MainWindow(QMainWindow):
         
     def save_profile(self):
         name_to_save, _ = QFileDialog.getSaveFileName(self, 'Save File')
-        xticks=np.arange(0,len(zi))*distance/len(zi)
-        data_to_save=pd.DataFrame([xticks,zi]).T
+        data_to_save=pd.DataFrame([profile_distances,zi]).T
         data_to_save.columns = ['meters', variable_name]
         data_to_save.to_csv(name_to_save)
        
@@ -182,35 +415,31 @@ class MainWindow(QMainWindow):
                 
     def profile(self):
         
-        data = rasterio.open(name)
-        resolution=data.transform[0]
-        rdata=data.read(1)
         #two points of the line as clicked
         x0, y0 = self.coords[0][0], self.coords[0][1] 
         x1, y1 = self.coords[1][0], self.coords[1][1]
         
+        #reading only the window around the line, in the background
+        self.statusBar().showMessage('Computing profile...')
+        worker = Worker(lambda progress_callback: extract_profile(get_dataset(name), 
+                                                                  x0, y0, x1, y1, 
+                                                                  interpolation=self.interpolation))
+        worker.signals.finished.connect(self.plot_profile)
+        worker.signals.error.connect(self.worker_error)
+        self.threadpool.start(worker)
         
-        def calculateDistance(x1,y1,x2,y2):  
-              dist = math.sqrt((x2 - x1)**2 + (y2 - y1)**2)  
-              return dist 
         
-        global distance
-        distance=calculateDistance(x0,y0,x1,y1)
+    def worker_error(self, error):
+        self.statusBar().showMessage('ERROR: %s' %error)
         
-        #100 times more points than resolution allows, just to be sure we get all of them before interpolation
-        num = np.int(distance/resolution)*100
         
-        #convert georeferenced coordinates to pixel numbers
-        with data as src:
-            x0_pix, y0_pix = rasterio.transform.rowcol(src.transform, x0, y0)
-            x1_pix, y1_pix = rasterio.transform.rowcol(src.transform, x1, y1)
-            
-        x, y = np.linspace(x0_pix, x1_pix, num), np.linspace(y0_pix, y1_pix, num)
+    def plot_profile(self, result):
         
-        # Extract the values along the line, using cubic interpolation
-        #use indexing directly for nearest neighbor sampling
-        global zi
-        zi = scipy.ndimage.map_coordinates(rdata, np.vstack((x,y)))
+        x0, y0 = self.coords[0][0], self.coords[0][1] 
+        x1, y1 = self.coords[1][0], self.coords[1][1]
+        
+        global profile_distances, zi
+        profile_distances, zi = result
         
         #-- Plot...
         #show((data, 1), interpolation='none', ax=ax)
@@ -220,11 +449,12 @@ class MainWindow(QMainWindow):
         ax1.axis('image')
         global ax2
         ax2=fig.add_subplot(121)
-        ax2.plot(zi,color='black')
+        ax2.plot(profile_distances,zi,color='black')
         ax2.set_xlabel('Meters',fontsize=20)
         ax2.set_ylabel(variable_name,fontsize=20)
         fig.canvas.draw()
         fig.canvas.flush_events()
+        self.statusBar().showMessage('Ready')
         
         
     def clear_profile(self):
@@ -235,6 +465,116 @@ class MainWindow(QMainWindow):
         self.coords=[]
         
     
+    def select_archive(self):
+        path = QFileDialog.getExistingDirectory(self, 'Select SICE archive')
+        if path:
+            self.archive_path = os.path.join(path, '')
+            self.cube_file = None
+        
+        
+    def select_time_cube(self):
+        name, _ = QFileDialog.getOpenFileName(self, 'Select time cube', '', 
+                                              'Time cube (*.tif)')
+        if name:
+            self.cube_file = name
+        
+        
+    def connect_pixel(self):
+        if self.archive_path is None and self.cube_file is None:
+            self.select_archive()
+        if self.archive_path is None and self.cube_file is None:
+            return
+        self.pixel_cid = fig.canvas.mpl_connect('button_press_event', self.select_pixel)
+        self.statusBar().showMessage('Click on a pixel...')
+        
+        
+    def select_pixel(self, event):
+        # Only use event within the axes.
+        if not event.inaxes == ax1:
+            return
+        fig.canvas.mpl_disconnect(self.pixel_cid)
+        self.time_series(event.xdata, event.ydata)
+        
+        
+    def read_time_series(self, archive_path, variable, x, y, cube_file=None, 
+                         progress_callback=None):
+        
+        #a time cube built by get_time_series.py is read if selected, or if 
+        #available in the archive
+        if cube_file is None and archive_path is not None:
+            cube_file = archive_path+variable+'_time_cube.tif'
+        if cube_file is not None and os.path.isfile(cube_file):
+            return read_time_cube(cube_file, x, y)
+        
+        #date -> file index is only built once per archive and variable
+        if (archive_path, variable) not in self.date_indexes:
+            if progress_callback is not None:
+                progress_callback('Indexing %s...' %archive_path)
+            self.date_indexes[(archive_path, variable)] = build_date_index(archive_path, 
+                                                                           variable)
+        date_index = self.date_indexes[(archive_path, variable)]
+        
+        if progress_callback is not None:
+            progress_callback('Reading %d dates...' %len(date_index))
+        return read_pixel_series(date_index, x, y)
+        
+        
+    def time_series(self, x, y):
+        
+        self.time_series_pixel = (x, y)
+        
+        #one windowed read per date, in the background
+        self.statusBar().showMessage('Reading time series...')
+        worker = Worker(self.read_time_series, self.archive_path, variable_name, x, y, 
+                        cube_file=self.cube_file)
+        worker.signals.progress.connect(self.statusBar().showMessage)
+        worker.signals.finished.connect(self.plot_time_series)
+        worker.signals.error.connect(self.worker_error)
+        self.threadpool.start(worker)
+        
+        
+    def plot_time_series(self, series):
+        
+        if self.time_series_plot is not None:
+            self.clear_time_series()
+            
+        if len(series)==0:
+            self.statusBar().showMessage('No %s files found in %s' %(variable_name, 
+                                                                    self.archive_path))
+            return
+        
+        global time_series
+        time_series = series
+        
+        x, y = self.time_series_pixel
+        marker = ax1.plot(x, y, 'bs')
+        ax3 = fig.add_subplot(121)
+        ax3.plot(series.index, series.values, 'o-', color='black')
+        ax3.set_xlabel('Date', fontsize=20)
+        ax3.set_ylabel(variable_name, fontsize=20)
+        fig.autofmt_xdate()
+        self.time_series_plot = (marker, ax3)
+        fig.canvas.draw()
+        fig.canvas.flush_events()
+        self.statusBar().showMessage('Ready')
+        
+        
+    def clear_time_series(self):
+        if self.time_series_plot is None:
+            return
+        marker, ax3 = self.time_series_plot
+        marker.pop(0).remove()
+        fig.delaxes(ax3)
+        fig.canvas.draw()
+        fig.canvas.flush_events()
+        self.time_series_plot = None
+        
+        
+    def save_time_series(self):
+        name_to_save, _ = QFileDialog.getSaveFileName(self, 'Save File')
+        time_series.to_csv(name_to_save, header=[variable_name])
+        
+    
     def open_new_dialog(self):
         self.nd = Help_window(self)
         self.nd.show()
@@ -273,11 +613,116 @@ class PlotCanvas(FigureCanvas):
         variable_name=name.split('/')[-1].split('.')[0]
         global ax1
         ax1 = self.figure.add_subplot(122)
-        show((data, 1), interpolation='none', ax=ax1)
+        ax1.set_xlim(data.bounds.left, data.bounds.right)
+        ax1.set_ylim(data.bounds.bottom, data.bounds.top)
+        ax1.set_aspect('equal')
         ax1.set_title(variable_name,fontsize=20)
         ax1.set_xlabel(units,fontsize=20)
         ax1.set_ylabel(units,fontsize=20)
-        self.draw()
+        
+        #the visible extent is read in the background, first decimated to the
+        #canvas, then at a higher resolution once the user stops zooming or 
+        #panning
+        self.image = None
+        self.view_id = 0
+        self.refreshing = False
+        self.threadpool = QThreadPool.globalInstance()
+        self.refresh_timer = QTimer()
+        self.refresh_timer.setSingleShot(True)
+        self.refresh_timer.timeout.connect(self.refresh_view)
+        ax1.callbacks.connect('xlim_changed', self.schedule_refresh)
+        ax1.callbacks.connect('ylim_changed', self.schedule_refresh)
+        self.refresh_view()
+        
+    def get_view_tiles(self, bounds):
+        '''
+        Selects the tiles to read to display the part of the raster within 
+        bounds. The overview level (power of 2 decimation) is chosen to match 
+        the size of the axes on screen.
+        
+        INPUTS:
+            bounds: (left, bottom, right, top) georeferenced bounds [tuple]
+            
+        OUTPUTS:
+            level: decimation factor [int]
+            tile_rows, tile_cols: indexes of the tiles, see read_tiles() [range]
+        
+        '''
+        
+        window = from_bounds(*bounds, transform=data.transform)
+        window = window.round_offsets(op='floor').round_lengths(op='ceil')
+        window = window.intersection(Window(0, 0, data.width, data.height))
+        
+        #one raster pixel per screen pixel at most
+        axes_size = ax1.get_window_extent()
+        scale = max(window.width/max(axes_size.width, 1), 
+                    window.height/max(axes_size.height, 1), 1)
+        level = 2**int(math.floor(math.log2(scale)))
+        
+        #tiles covering the window, in full resolution pixels
+        span = tile_size*level
+        tile_rows = range(int(window.row_off)//span, 
+                          (int(window.row_off+window.height)-1)//span+1)
+        tile_cols = range(int(window.col_off)//span, 
+                          (int(window.col_off+window.width)-1)//span+1)
+        
+        return level, tile_rows, tile_cols
+    
+    def schedule_refresh(self, ax):
+        if not self.refreshing:
+            self.refresh_timer.start(200)
+            
+    def refresh_view(self):
+        xlim, ylim = ax1.get_xlim(), ax1.get_ylim()
+        bounds = (min(xlim), min(ylim), max(xlim), max(ylim))
+        
+        #nothing to read outside the raster
+        if bounds[0] >= data.bounds.right or bounds[2] <= data.bounds.left \
+            or bounds[1] >= data.bounds.top or bounds[3] <= data.bounds.bottom:
+            return
+        
+        level, tile_rows, tile_cols = self.get_view_tiles(bounds)
+        
+        #only the last requested view is displayed
+        self.view_id += 1
+        view_id, filename = self.view_id, name
+        
+        worker = Worker(lambda progress_callback: (view_id, 
+                                                   read_tiles(filename, level, 
+                                                              tile_rows, tile_cols,
+                                                              progress_callback)))
+        worker.signals.finished.connect(self.show_view)
+        worker.signals.progress.connect(self.show_status)
+        worker.signals.error.connect(self.show_error)
+        self.threadpool.start(worker)
+        
+    def show_view(self, result):
+        view_id, (rview, extent) = result
+        
+        if view_id != self.view_id:
+            return
+        
+        #updating the image without triggering another refresh
+        xlim, ylim = ax1.get_xlim(), ax1.get_ylim()
+        self.refreshing = True
+        if self.image is None:
+            self.image = ax1.imshow(rview, extent=extent, interpolation='none')
+        else:
+            self.image.set_data(rview)
+            self.image.set_extent(extent)
+        ax1.set_xlim(xlim)
+        ax1.set_ylim(ylim)
+        self.refreshing = False
+        self.draw_idle()
+        self.show_status('Ready')
+        
+    def show_status(self, message):
+        window = self.window()
+        if isinstance(window, QMainWindow):
+            window.statusBar().showMessage(message)
+            
+    def show_error(self, error):
+        self.show_status('ERROR: %s' %error)
         
 
 
@@ -293,13 +738,20 @@ class Help_window(QWidget):
                 -"Exit...": Quit the GUI.
                 
             View:
-                -"Show raster...": Display the raster conserving its projection.
+                -"Show raster...": Display the raster conserving its projection, at the screen resolution.
                 
             Tools:
                 -"Profile tool": Create a 1D profile through the imported raster.
                     -"Select points...": Compute the profile based starting and ending points clicked by the user.
                     -"Save profile...": Save the resulting values and distance along profile in a .csv file.
                     -"Clear profile...": Delete the current profile to create a new one.
+                    -"Interpolation": Nearest or bilinear interpolation of the values along the profile.
+                -"Time series tool": Plot the time series of the displayed variable at a pixel across the SICE date folders.
+                    -"Select pixel...": Read the values of the pixel clicked by the user at each date.
+                    -"Clear time series...": Delete the current time series.
+                    -"Save time series...": Save the resulting values and dates in a .csv file.
+                    -"Select SICE archive...": Folder containing the SICE date folders (or a time cube built by get_time_series.py).
+                    -"Select time cube...": Time cube built by get_time_series.py (in its outpath), read instead of the SICE archive.
             
              Help:
                 Help window to display this message.""")
@@ -4,68 +4,83 @@
 @author: Adrien Wehrlé, GEUS (Geological Survey of Denmark and Greenland)
 
 Run sice.py using multiprocessing with the nb_cores available.
-Multiprocessing is used over years if only one day per year, over days of the 
-different years otherwise.  
-If two days are given, range inbetween day1 and day2. If more than two days,
-given days are run. 
-"#!/usr/bin/env python" needs to be added as the first line of sice.py. 
+One day per year runs this day for each year. If two days are given, range
+inbetween day1 and day2 for each year. If more than two days, given days are
+run for each year.
+All the (year, date) tasks of the different years are dispatched to a single
+pool, so that cores do not idle at the end of each year.
+"#!/usr/bin/env python" needs to be added as the first line of sice.py.
+
+e.g. python sicepy_multiprocessing.py /path/to/mosaics 152 243 2018 2019
 
 """
 
-import os
 import sys
+import datetime
 import subprocess
-import numpy as np
+import functools
 import multiprocessing
 from multiprocessing import Pool
 
 nb_cores=multiprocessing.cpu_count()
 
-mosaic_root=(sys.argv)[1]
-doys_years=(sys.argv)[2:]
 
-doys=[]
-[doys.append(np.int(i)) for i in doys_years if len(i)==3]
-years=[]
-[years.append(np.int(i)) for i in doys_years if len(i)==4]
+def get_tasks(doys, years):
+    '''
+    INPUTS:
+        doys: days of year, one day, two days delimiting a range or more
+              than two given days [list]
+        years: years to process [list]
+
+    OUTPUTS:
+        tasks: (year, date) to process, date as YYYY-MM-DD [list]
 
+    '''
 
-def sicepy_multiprocessing(k):
-    
-    if len(doys)==1:
-        date=subprocess.check_output('date -d "'+str(years[k])+'-01-01 +$(('+str(doy)+'-1 ))\
-                                              days" "+%Y-%m-%d"', shell=True)
+    # two days: days from day1 to day2.
+    if len(doys)==2:
+        days=list(range(doys[0],doys[1]+1))
+    # one day or more than two days: given days.
     else:
-        date=subprocess.check_output('date -d "'+str(year)+'-01-01 +$(('+str(dates[k])+'-1 ))\
-                                              days" "+%Y-%m-%d"', shell=True)
+        days=doys
 
-    os.system('./sice.py '+mosaic_root+'/'+date.decode("utf-8"))
+    tasks=[(year, (datetime.date(year,1,1)+datetime.timedelta(days=doy-1)).strftime('%Y-%m-%d'))
+           for year in years for doy in days]
 
+    return tasks
 
-# one day: multiprocessing over years
-if len(doys)==1: 
-    
-    doy=doys[0]
-    op=len(years)
-    
-    if __name__ == '__main__':
-        with Pool(nb_cores) as p:
-            p.map(sicepy_multiprocessing, np.arange(0,op)) 
 
+def sicepy_multiprocessing(mosaic_root, task):
+    '''
+    INPUTS:
+        mosaic_root: folder containing the date folders to process [string]
+        task: (year, date) to process, see get_tasks() [tuple]
 
-else:
-    
-    # two days: multiprocessing over days from day1 to day2.
-    if len(doys)==2:
-        dates=list(range(doys[0],doys[1]+1))
-        op=len(dates)
-        
-    # more than two days: multiprocessing over days for the given dates.  
-    elif len(doys)>2:
-        dates=doys
-        op=len(dates)
-        
-    for year in years:
-        if __name__ == '__main__':
-            with Pool(nb_cores) as p:
-                p.map(sicepy_multiprocessing, np.arange(0,op))   
+    OUTPUTS:
+        task: processed (year, date) [tuple]
+        returncode: return code of sice.py [int]
+
+    '''
+
+    year, date = task
+
+    returncode=subprocess.call(['./sice.py', mosaic_root+'/'+date])
+
+    return task, returncode
+
+
+if __name__ == '__main__':
+
+    mosaic_root=(sys.argv)[1]
+    doys_years=(sys.argv)[2:]
+
+    doys=[int(i) for i in doys_years if len(i)==3]
+    years=[int(i) for i in doys_years if len(i)==4]
+
+    tasks=get_tasks(doys, years)
+
+    with Pool(min(nb_cores, max(len(tasks), 1))) as p:
+        for (year, date), returncode in p.imap_unordered(functools.partial(sicepy_multiprocessing,
+                                                                           mosaic_root), tasks):
+            if returncode!=0:
+                print('ERROR: sice.py failed for %s (return code %d)' %(date, returncode))
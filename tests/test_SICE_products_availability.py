@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+
+Tests of the scan and validation of SICE_products_availability.py on a dataset
+with date folders named both YYYYMMDD and YYYY-MM-DD.
+
+"""
+
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from SICE_products_availability import (get_availability_matrix, get_validity_matrix,
+                                        regions_availability_check, scan_dataset)
+
+
+def write_product(filename,value):
+    with rasterio.open(filename,'w',driver='GTiff',height=8,width=8,count=1,
+                       dtype='float32',nodata=-999.,crs='EPSG:3413',
+                       transform=from_origin(0,0,500,500)) as dst:
+        dst.write(np.full((8,8),value,dtype=np.float32),1)
+
+
+def test_validity_duplicated_date_folders(tmp_path):
+    inpath=str(tmp_path/'mosaic')+os.sep
+    #albedo and r_TOA_01 of 2019-06-01 split over two folders, empty SGD
+    for folder, variables in [('20190601',{'albedo': 0.8}),
+                              ('2019-06-01',{'r_TOA_01': 0.5,'SGD': -999.}),
+                              ('20190602',{'albedo': 0.7,'r_TOA_01': 0.4})]:
+        os.makedirs(inpath+folder)
+        for variable, value in variables.items():
+            write_product(inpath+folder+os.sep+variable+'.tif',value)
+
+    variables=['albedo','r_TOA_01','SGD']
+    date_list=pd.date_range('2019-06-01','2019-06-02')
+
+    available_variables=scan_dataset(inpath,nb_threads=2,progress_bar=False)
+    availability=get_availability_matrix(available_variables,variables,date_list)
+    np.testing.assert_array_equal(availability,[[1,1,1],[1,1,0]])
+
+    validity, statistics = get_validity_matrix(inpath,availability,variables,date_list,
+                                               validation_cache=str(tmp_path/'cache.sqlite'),
+                                               nb_threads=2)
+
+    np.testing.assert_array_equal(validity,[[1,1,-1],[1,1,0]])
+    assert all(os.path.isfile(path) for path in statistics['path'])
+
+
+def test_validity_missing_product(tmp_path):
+    inpath=str(tmp_path/'mosaic')+os.sep
+    os.makedirs(inpath+'20190601')
+    write_product(inpath+'20190601'+os.sep+'albedo.tif',0.8)
+
+    variables=['albedo','r_TOA_01']
+    date_list=pd.date_range('2019-06-01','2019-06-01')
+    #r_TOA_01 removed since the scan
+    availability=np.array([[1,1]],dtype=np.uint8)
+
+    validity, statistics = get_validity_matrix(inpath,availability,variables,date_list,
+                                               validation_cache=str(tmp_path/'cache.sqlite'),
+                                               nb_threads=2)
+
+    np.testing.assert_array_equal(validity,[[1,-1]])
+    assert statistics['valid_fraction'].tolist()==[1.,0.]
+
+
+@pytest.mark.parametrize('catalogue',[False,True])
+def test_regions_missing_region(tmp_path,catalogue):
+    inpath=str(tmp_path)+os.sep+'{region}'+os.sep+'mosaic'+os.sep
+    os.makedirs(inpath.format(region='Iceland')+'20190601')
+    write_product(inpath.format(region='Iceland')+'20190601'+os.sep+'albedo.tif',0.8)
+
+    #Svalbard mosaic folder missing
+    data_availability=regions_availability_check(inpath=inpath,regions=['Svalbard','Iceland'],
+                                                 outpath=str(tmp_path)+os.sep,
+                                                 variables=['albedo','SGD'],
+                                                 start_date='2019-06-01',end_date='2019-06-02',
+                                                 catalogue=str(tmp_path/'catalogue.sqlite')
+                                                 if catalogue else None,
+                                                 nb_threads=2)
+
+    assert data_availability['region'].unique().tolist()==['Iceland']
+    assert data_availability['albedo'].tolist()==[1,0]
+    assert data_availability['SGD'].tolist()==[0,0]
@@ -0,0 +1,45 @@
+# -*- coding: utf-8 -*-
+"""
+
+Tests of the point sampling of extract_profiles.py at the edges of a raster,
+and of a raster processed without any feature.
+
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+import rasterio
+from rasterio.transform import from_origin
+
+from extract_profiles import raster_processing, sample_points
+
+
+@pytest.fixture
+def raster(tmp_path):
+    filename=str(tmp_path/'2019-06-01'/'albedo.tif')
+    (tmp_path/'2019-06-01').mkdir()
+    with rasterio.open(filename,'w',driver='GTiff',height=4,width=5,count=1,
+                       dtype='float32',crs='EPSG:3413',
+                       transform=from_origin(0,0,100,100)) as dst:
+        dst.write(np.arange(20,dtype=np.float32).reshape(4,5),1)
+    return filename
+
+
+@pytest.mark.parametrize('interpolation',['nearest','bilinear'])
+def test_sample_points_edges(raster,interpolation):
+    #inside the edge pixels, then less than a pixel outside the raster
+    xs=[10,490,250,250,-30,530,250,250]
+    ys=[-10,-390,-10,-390,-150,-150,30,-430]
+
+    with rasterio.open(raster) as src:
+        values=sample_points(src,xs,ys,interpolation=interpolation)
+
+    np.testing.assert_allclose(values[:4],[0,19,2,17])
+    assert np.all(np.isnan(values[4:]))
+
+
+def test_raster_processing_no_feature(raster):
+    features=pd.DataFrame({'id': [],'x0': [],'y0': [],'x1': [],'y1': [],'type': []})
+
+    assert raster_processing((raster,features,None,'bilinear')) is None
@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+"""
+
+Tests of the moving-window correlation of get_correlations.py against
+scipy.stats.linregress, including specific areas where a variable is constant,
+and of the tiled run against the whole grid.
+
+"""
+
+import numpy as np
+import pytest
+from scipy import stats
+
+from get_correlations import SGD_B_correlation
+
+
+resolution=4
+
+
+def linregress_window(x,y,row,col,res=int(resolution/2)):
+    '''
+    Reference linear regression over the specific area of a pixel, NaN where x
+    is constant and for rvalue, pvalue and stderr where y is constant.
+    '''
+
+    wx=x[max(0,row-res):row+res,max(0,col-res):col+res].ravel()
+    wy=y[max(0,row-res):row+res,max(0,col-res):col+res].ravel()
+    valid=np.isfinite(wx) & np.isfinite(wy)
+    wx, wy = wx[valid], wy[valid]
+
+    if np.ptp(wx)==0:
+        return dict(slope=np.nan,intercept=np.nan,rvalue=np.nan,pvalue=np.nan,
+                    stderr=np.nan)
+    result=stats.linregress(wx,wy)
+    if np.ptp(wy)==0:
+        return dict(slope=result.slope,intercept=result.intercept,rvalue=np.nan,
+                    pvalue=np.nan,stderr=np.nan)
+
+    return dict(slope=result.slope,intercept=result.intercept,rvalue=result.rvalue,
+                pvalue=result.pvalue,stderr=result.stderr)
+
+
+@pytest.fixture
+def variables():
+    rng=np.random.RandomState(0)
+    x=rng.normal(0.7,0.2,(60,80))
+    y=0.3*x+rng.normal(300,20,(60,80))
+    #constant x and constant y specific areas
+    x[10:20,10:20]=0.9
+    y[35:45,50:60]=280.
+    x[3,3]=np.nan
+    return x, y
+
+
+def test_rvalues_constant_windows(variables):
+    x, y = variables
+    rvalues=SGD_B_correlation(resolution=resolution).correlation(x,y)
+
+    assert np.all(np.isnan(rvalues[12:19,12:19]))
+    assert np.all(np.isnan(rvalues[37:44,52:59]))
+
+    for row in range(0,60,3):
+        for col in range(0,80,3):
+            expected=linregress_window(x,y,row,col)['rvalue']
+            np.testing.assert_allclose(rvalues[row,col],expected,rtol=1e-6,atol=1e-9)
+
+
+def test_rvalues_constant_windows_large_grid():
+    rng=np.random.RandomState(1)
+    x=rng.normal(0.7,0.2,(1500,1500))
+    y=rng.normal(300,20,(1500,1500))
+    x[-40:-20,-40:-20]=0.9
+    y[-80:-60,-80:-60]=280.
+    rvalues=SGD_B_correlation(resolution=resolution).correlation(x,y)
+
+    assert np.all(np.isnan(rvalues[-38:-21,-38:-21]))
+    assert np.all(np.isnan(rvalues[-78:-61,-78:-61]))
+    assert np.isnan(rvalues).sum()==2*17*17
+
+
+def test_statistics_constant_windows(variables):
+    x, y = variables
+    results=SGD_B_correlation(resolution=resolution).regression(x,y)
+    statistics=SGD_B_correlation.statistics
+
+    #constant x: no regression
+    assert np.all(np.isnan(results[:5,12:19,12:19]))
+    #constant y: flat regression line, no correlation
+    np.testing.assert_allclose(results[0,37:44,52:59],0,atol=1e-12)
+    np.testing.assert_allclose(results[1,37:44,52:59],280.)
+    assert np.all(np.isnan(results[2:5,37:44,52:59]))
+
+    for row in range(0,60,3):
+        for col in range(0,80,3):
+            expected=linregress_window(x,y,row,col)
+            for i, statistic in enumerate(statistics[:5]):
+                np.testing.assert_allclose(results[i,row,col],expected[statistic],
+                                           rtol=1e-6,atol=1e-9)
+
+
+def test_multiscale_statistics_constant_windows(variables):
+    x, y = variables
+    results=SGD_B_correlation().multiscale(x,y,[resolution,8])
+
+    assert np.all(np.isnan(results[resolution][:5,12:19,12:19]))
+    assert np.all(np.isnan(results[8][:5,14:17,14:17]))
+    assert np.all(np.isnan(results[8][2,39:42,54:57]))
+
+
+def test_temporal_constant_pixels(tmp_path):
+    import rasterio
+    from rasterio.transform import from_origin
+    from get_correlations import SGD_B_temporal_correlation
+
+    rng=np.random.RandomState(2)
+    nb_dates=12
+    x=rng.normal(0.7,0.2,(nb_dates,5,6))
+    y=0.3*x+rng.normal(300,20,(nb_dates,5,6))
+    #saturated x and fill y through time
+    x[:,1,2]=0.99
+    y[:,3,4]=-999.
+    x[4,0,0]=np.nan
+
+    files={'x': [], 'y': []}
+    for k in range(nb_dates):
+        for name, data in [('x',x),('y',y)]:
+            filename=str(tmp_path/('%s_%02d.tif' %(name,k)))
+            with rasterio.open(filename,'w',driver='GTiff',height=5,width=6,count=1,
+                               dtype='float64',crs='EPSG:3413',
+                               transform=from_origin(0,0,500,500)) as dst:
+                dst.write(data[k],1)
+            files[name].append(filename)
+
+    c=SGD_B_temporal_correlation(files['x'],files['y'])
+    results=c.regression(verbose=False)
+    rvalues=c.correlation(verbose=False)
+
+    assert np.all(np.isnan(results[:5,1,2]))
+    assert np.isnan(rvalues[1,2]) and np.isnan(rvalues[3,4])
+    np.testing.assert_allclose(results[0,3,4],0,atol=1e-12)
+
+    for row in range(5):
+        for col in range(6):
+            valid=np.isfinite(x[:,row,col])
+            wx, wy = x[valid,row,col], y[valid,row,col]
+            if np.ptp(wx)==0 or np.ptp(wy)==0:
+                continue
+            expected=stats.linregress(wx,wy)
+            for i, statistic in enumerate(SGD_B_temporal_correlation.statistics[:5]):
+                np.testing.assert_allclose(results[i,row,col],getattr(expected,statistic),
+                                           rtol=1e-6)
+            np.testing.assert_allclose(rvalues[row,col],expected.rvalue,rtol=1e-6)
+
+
+@pytest.mark.parametrize('full_statistics',[True,False])
+def test_tiled_statistics(variables,tmp_path,full_statistics):
+    import rasterio
+    from rasterio.transform import from_origin
+
+    x, y = variables
+    filenames={}
+    for name, data in [('x',x),('y',y)]:
+        filenames[name]=str(tmp_path/('%s.tif' %name))
+        with rasterio.open(filenames[name],'w',driver='GTiff',height=60,width=80,count=1,
+                           dtype='float64',crs='EPSG:3413',
+                           transform=from_origin(0,0,500,500)) as dst:
+            dst.write(data,1)
+
+    #16 pixel tiles, the constant x specific area crossing a tile border
+    c=SGD_B_correlation(SGD=filenames['x'],B=filenames['y'])
+    output_filenames={resolution: str(tmp_path/('statistics_%d.tif' %resolution))
+                      for resolution in [resolution,8]}
+    c.tiled(output_filenames,full_statistics=full_statistics,tile_size=16,nb_cores=2)
+
+    expected=c.multiscale(x,y,[resolution,8],full_statistics=full_statistics)
+    for res, output_filename in output_filenames.items():
+        with rasterio.open(output_filename) as src:
+            results=src.read()
+        np.testing.assert_allclose(results,expected[res],rtol=1e-7,atol=1e-9)
+        assert np.array_equal(np.isnan(results),np.isnan(expected[res]))
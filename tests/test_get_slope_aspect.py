@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+"""
+
+Tests of the slopes and slope aspects of get_slope_aspect.py on planes of
+known slope and aspect, for both finite difference kernels.
+
+"""
+
+import numpy as np
+import pytest
+
+from get_slope_aspect import compute_slope_aspect
+
+
+pixel_size=(500.,250.)
+
+
+def plane(dzdx,dzdy,shape=(7,9)):
+    '''
+    Elevation rising by dzdx eastwards and dzdy northwards, rows increasing
+    southwards, with a one pixel halo.
+    '''
+
+    rows, cols = np.mgrid[:shape[0]+2,:shape[1]+2]
+    return dzdx*cols*pixel_size[0]-dzdy*rows*pixel_size[1]
+
+
+@pytest.mark.parametrize('method',['horn','zevenbergen_thorne'])
+@pytest.mark.parametrize('dzdx,dzdy,expected_aspect',[(0.1,0.,270.),
+                                                      (0.,0.1,180.),
+                                                      (-0.1,0.,90.),
+                                                      (0.1,0.1,225.),
+                                                      (-0.05,-0.05,45.)])
+def test_planes(method,dzdx,dzdy,expected_aspect):
+    slope, aspect = compute_slope_aspect(plane(dzdx,dzdy),pixel_size,method=method)
+
+    assert slope.shape==aspect.shape==(7,9)
+    np.testing.assert_allclose(slope,np.rad2deg(np.arctan(np.hypot(dzdx,dzdy))),
+                               rtol=1e-5)
+    np.testing.assert_allclose(aspect,expected_aspect,rtol=1e-5)
+
+
+@pytest.mark.parametrize('method',['horn','zevenbergen_thorne'])
+def test_flat_plane(method):
+    slope, aspect = compute_slope_aspect(np.full((9,11),1500.),pixel_size,method=method)
+
+    np.testing.assert_array_equal(slope,0)
+    np.testing.assert_array_equal(aspect,0)
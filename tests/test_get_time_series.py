@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+"""
+
+Tests of the date index and time cube of get_time_series.py when date folders
+are added or removed after the index was stored.
+
+"""
+
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import rasterio
+from rasterio.transform import from_origin
+
+from get_time_series import build_date_index, build_time_cube, read_time_cube
+
+
+def write_date(inpath,folder,value,variable='albedo'):
+    os.makedirs(inpath+folder)
+    with rasterio.open(inpath+folder+os.sep+variable+'.tif','w',driver='GTiff',height=8,
+                       width=8,count=1,dtype='float32',crs='EPSG:3413',
+                       transform=from_origin(0,0,500,500)) as dst:
+        dst.write(np.full((8,8),value,dtype=np.float32),1)
+
+
+def test_date_index_new_folders(tmp_path):
+    inpath=str(tmp_path/'mosaic')+os.sep
+    index_file=str(tmp_path/'albedo_date_index.csv')
+    cube_file=str(tmp_path/'albedo_time_cube.tif')
+    write_date(inpath,'2019-06-01',1.)
+    write_date(inpath,'2019-06-02',2.)
+    #date folder without the variable
+    os.makedirs(inpath+'2019-06-03')
+
+    date_index=build_date_index(inpath,'albedo',index_file=index_file)
+    assert len(date_index)==2
+
+    #NRT date folder added, another one removed
+    write_date(inpath,'20190604',4.)
+    shutil.rmtree(inpath+'2019-06-01')
+
+    date_index=build_date_index(inpath,'albedo',index_file=index_file)
+    expected_dates=pd.to_datetime(['2019-06-02','2019-06-04'])
+    assert date_index.index.equals(pd.DatetimeIndex(expected_dates,name='date'))
+    stored_index=pd.read_csv(index_file,index_col='date',parse_dates=['date'])['path']
+    assert stored_index.tolist()==date_index.tolist()
+
+    build_time_cube(date_index,cube_file,blocksize=16,verbose=False)
+    series=read_time_cube(cube_file,1000,-1000)
+    assert series.tolist()==[2.,4.]
+    assert series.index.equals(expected_dates)